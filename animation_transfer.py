@@ -7,23 +7,807 @@ bl_info = {
     "location": "View3D > Object > Animation",
     "category": "Animation"}
 
+import io
+import os
+import sys
 import json
+import time
+import pstats
+import cProfile
+import contextlib
+import hashlib
+import argparse
 import itertools
 import mathutils
 import bpy
 import re
+import struct
+import tempfile
 from bpy.props import StringProperty
 from bpy_extras.io_utils import ImportHelper
 from copy import copy
-from math import ceil
+from math import ceil, floor
 from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 import numpy as np
 
-def get_data_bone(armature, idx):
-  return list(armature.data.bones)[idx]
+class BoneCache():
+  """
+  Keeps the handles of the pose bones of the armatures used during an operation, so bones can be looked up by index or name
+  without going through the bone collections every time.
+  The handles of an armature are read the first time it is used and are not checked again, so they must be invalidated
+  whenever its bones change, e.g. after switching to edit mode, since that rebuilds the pose bones.
+  """
+  def __init__(self):
+    self._armatures = {}
+
+  def _get(self, armature):
+    entry = self._armatures.get(armature.as_pointer())
+    if entry is None:
+      pose_bones = list(armature.pose.bones)
+      entry = (pose_bones, {b.name: b for b in pose_bones})
+      self._armatures[armature.as_pointer()] = entry
+    return entry
+
+  def pose_bone(self, armature, idx):
+    return self._get(armature)[0][idx]
+
+  def pose_bone_by_name(self, armature, name):
+    return self._get(armature)[1].get(name)
+
+  def invalidate(self, armature=None):
+    """
+    Discards the cached handles.
+    :param armature: Armature object whose handles are discarded. If None, the handles of all the armatures are discarded.
+    """
+    if armature is None:
+      self._armatures.clear()
+    else:
+      self._armatures.pop(armature.as_pointer(), None)
+
+def set_frame(scene, frame):
+  """
+  Sets the current frame of the scene, which may be fractional, and evaluates it.
+  """
+  frame = float(frame)
+  scene.frame_set(floor(frame), subframe=frame - floor(frame))
+
+#Channels of the pose bones that can be transferred, with their number of components
+bone_channels = {"location": 3, "rotation_quaternion": 4, "rotation_axis_angle": 4, "rotation_euler": 3, "scale": 3}
+
+def channel_layout(channels):
+  """
+  :param channels: List of pose bone channels (see bone_channels)
+  :return: Dictionary {channel: slice} with the columns of each channel in the samples of sample_pose_bones
+  """
+  layout = {}
+  first = 0
+  for channel in channels:
+    layout[channel] = slice(first, first + bone_channels[channel])
+    first += bone_channels[channel]
+  return layout
+
+def sample_pose_bones(scene, armature, bone_indices, frames, out=None, channels=("location", "rotation_quaternion")):
+  """
+  Evaluates the scene once per frame and reads some channels of several pose bones.
+  :param scene: Scene that is evaluated
+  :param armature: Armature object whose pose bones are read
+  :param bone_indices: List with the indices of the pose bones to read
+  :param frames: Array with the frames to evaluate (they may be fractional)
+  :param out: Preallocated array of size (len(frames), len(bone_indices), C) in which to store the result. If None, a new one is created.
+  :param channels: Channels that are read (see bone_channels), by default the location and the rotation quaternion
+  :return: Array of size (len(frames), len(bone_indices), C) with, for each frame and bone, the components of the channels one after
+    the other (see channel_layout). By default, the location (x, y, z) and the rotation quaternion (w, x, y, z).
+  """
+  layout = channel_layout(channels)
+  if out is None:
+    out = np.empty((len(frames), len(bone_indices), sum(bone_channels[c] for c in channels)))
+
+  n = len(armature.pose.bones)
+  buffers = {channel: np.empty(bone_channels[channel] * n, dtype=np.float32) for channel in channels}
+  bone_indices = np.asarray(bone_indices, dtype=np.int64)
+
+  for f, frame in enumerate(frames):
+    set_frame(scene, frame)
+    #Read the channels of all the bones at once
+    for channel, buffer in buffers.items():
+      armature.pose.bones.foreach_get(channel, buffer)
+      out[f, :, layout[channel]] = buffer.reshape(n, -1)[bone_indices]
+  return out
+
+@contextlib.contextmanager
+def sampling_scope(armatures):
+  """
+  Stops Blender from evaluating the objects parented to some armatures (i.e. their skinned meshes, with their modifiers
+  and shape keys) while the pose bones of the armatures are sampled. The objects are disabled in the viewport and their
+  modifiers too, and both are restored exactly when the scope ends, even if it ends with an error.
+  Objects used as targets by the constraints of the armatures are kept, since the pose depends on them.
+  :param armatures: List of armature objects that are sampled
+  """
+  needed = set(armature.as_pointer() for armature in armatures)
+  for armature in armatures:
+    constraints = list(armature.constraints) + [c for bone in armature.pose.bones for c in bone.constraints]
+    needed.update(c.target.as_pointer() for c in constraints if getattr(c, "target", None) is not None)
+
+  hidden = []
+  disabled = []
+  pending = list(armatures)
+  try:
+    while len(pending) > 0:
+      for child in pending.pop().children:
+        pending.append(child)
+        if child.type == 'ARMATURE' or child.as_pointer() in needed or child.library is not None:
+          continue
+        if not child.hide_viewport:
+          child.hide_viewport = True
+          hidden.append(child)
+        for modifier in child.modifiers:
+          if modifier.show_viewport:
+            modifier.show_viewport = False
+            disabled.append(modifier)
+    yield
+  finally:
+    for modifier in disabled:
+      modifier.show_viewport = True
+    for obj in hidden:
+      obj.hide_viewport = False
+
+#Number of frames sampled by each step of the transfers that are run in steps (see BaseAnimationTransfer.transfer_steps)
+transfer_step_frames = 8
+#Number of matches whose keyframes are packed ahead of the one being written (see BaseAnimationTransfer.bake)
+transfer_pack_ahead = 4
+
+def sample_steps(scene, armature, bone_indices, frames, out, channels=("location", "rotation_quaternion"), window=None):
+  """
+  Samples the pose bones as sample_pose_bones does, a few frames at a time (transfer_step_frames).
+  :param out: Preallocated array of size (len(frames), len(bone_indices), C) in which the samples are stored
+  :param window: Preallocated array of size (W, len(bone_indices), C) in which every W frames are sampled before they are
+    copied to out at once (see track_buffer), or None to sample directly into out
+  :return: Generator that yields the fraction of the frames that have been sampled after each step
+  """
+  if window is None:
+    for first in range(0, len(frames), transfer_step_frames):
+      end = min(first + transfer_step_frames, len(frames))
+      sample_pose_bones(scene, armature, bone_indices, frames[first:end], out[first:end], channels)
+      yield end / len(frames)
+    return
+
+  for start in range(0, len(frames), len(window)):
+    stop = min(start + len(window), len(frames))
+    for first in range(start, stop, transfer_step_frames):
+      end = min(first + transfer_step_frames, stop)
+      sample_pose_bones(scene, armature, bone_indices, frames[first:end], window[first - start:end - start], channels)
+      yield end / len(frames)
+    out[start:stop] = window[0:stop - start]
+
+def track_buffer(shape, window, dtype=np.float64):
+  """
+  Allocates the array in which the pose bones are sampled (see sample_steps). If it has more frames than the sampling window,
+  it is mapped to a temporary file instead of being kept in memory, with the frames of each bone one after the other, so
+  the memory used does not depend on the length of the animation and the track of each bone is read at once.
+  :param shape: Tuple (frames, bones, C) with the size of the array
+  :param window: Maximum number of frames sampled in memory, or 0 to keep every frame in memory
+  :param dtype: Type of the array if it is kept in memory. Mapped arrays have 32 bit floats, like the pose bones.
+  :return: Tuple (out, window) with the array and the array in which each window of frames is sampled, or None if
+    the array is kept in memory
+  """
+  if window <= 0 or shape[0] <= window:
+    return np.empty(shape, dtype=dtype), None
+  #The file is deleted when it is no longer mapped
+  with tempfile.TemporaryFile(prefix="animation_transfer_") as f:
+    mapped = np.memmap(f, dtype=np.float32, mode='w+', shape=(shape[1], shape[0], shape[2]))
+  return mapped.transpose(1, 0, 2), np.empty((window,) + tuple(shape[1:]))
+
+def run_steps(steps):
+  """
+  Runs a generator of steps (like BaseAnimationTransfer.transfer_steps) until the end.
+  :return: The value returned by the generator
+  """
+  while True:
+    try:
+      next(steps)
+    except StopIteration as stop:
+      return stop.value
+
+class InlineExecutor():
+  """
+  Runs the submitted functions right away in the calling thread, with the interface of the executors of concurrent.futures.
+  """
+  def submit(self, function, *args):
+    future = Future()
+    try:
+      future.set_result(function(*args))
+    except Exception as e:
+      future.set_exception(e)
+    return future
+
+  def shutdown(self, wait=True):
+    pass
+
+def track_channels(armature):
+  """
+  :param armature: Armature object
+  :return: List with the channels that a transfer may read from the pose bones of the armature (see sources_of_writes):
+    the location, the rotation channel of every rotation mode in use and the scale
+  """
+  rotations = set(rotation_channel(bone.rotation_mode) for bone in armature.pose.bones)
+  return [channel for channel in bone_channels if channel in ("location", "scale") or channel in rotations]
+
+class OriginTracks():
+  """
+  Keeps the sampled channels of every pose bone of origin armatures, so the same origin animation is evaluated only once
+  when it is transferred to several target armatures (see BaseAnimationTransfer.transfer_to_targets).
+  The tracks are kept for each armature, active action and sampled frames, with every channel that the plan of any target
+  may read (see track_channels), as 32 bit floats like the pose bones return them.
+  """
+  def __init__(self, window=0):
+    self._tracks = {}
+    #Maximum number of frames sampled in memory (see track_buffer)
+    self.window = window
+
+  def _key(self, armature, frames):
+    action = armature.animation_data.action if armature.animation_data is not None else None
+    return (armature.as_pointer(), action.as_pointer() if action is not None else 0, np.asarray(frames, dtype=float).tobytes())
+
+  def cached(self, armature, frames):
+    return self._key(armature, frames) in self._tracks
+
+  def sample_steps(self, scene, armature, frames):
+    """
+    Samples the tracks of an armature over some frames, unless they are already kept.
+    :return: Generator that yields the fraction of the frames that have been sampled after each step
+    """
+    key = self._key(armature, frames)
+    if key in self._tracks:
+      return
+    layout = channel_layout(track_channels(armature))
+    tracks, window = track_buffer((len(frames), len(armature.pose.bones), sum(bone_channels[c] for c in layout)), self.window, np.float32)
+    yield from sample_steps(scene, armature, range(len(armature.pose.bones)), frames, tracks, list(layout), window)
+    self._tracks[key] = (tracks, layout)
+
+  def read(self, armature, frames, bone_indices, rows, out, channels):
+    """
+    Copies some of the kept tracks, sampled before with sample_steps, as sample_pose_bones returns them.
+    :param rows: Index (slice or array) of the frames to copy
+    :param out: Array of size (len(frames[rows]), len(bone_indices), C) in which the channels are copied
+    :param channels: Channels that are copied (see bone_channels)
+    """
+    tracks, layout = self._tracks[self._key(armature, frames)]
+    #Bone after bone, so mapped tracks are not loaded at once
+    for b, bone_index in enumerate(bone_indices):
+      track = tracks[:, bone_index][rows]
+      for channel, columns in channel_layout(channels).items():
+        out[:, b, columns] = track[:, layout[channel]]
+
+  def clear(self):
+    self._tracks.clear()
+
+bone_path_re = re.compile(r'^pose\.bones\["((?:[^"\\]|\\.)*)"\]\.(\w+)$')
+
+def parse_bone_data_path(data_path):
+  """
+  Splits the F-Curve data path of a pose bone channel into the name of the bone and the name of the channel.
+  :param data_path: Data path in the form pose.bones["<bone_name>"].<channel>
+  :return: Tuple (bone_name, channel), or None if the data path does not belong to a pose bone channel
+  """
+  m = bone_path_re.match(data_path)
+  if m is None:
+    return None
+  return re.sub(r'\\(.)', r'\1', m.group(1)), m.group(2)
+
+def bone_fcurves(action):
+  """
+  Groups the F-Curves of an action by the pose bone and channel they animate.
+  :param action: Action with the F-Curves
+  :return: Dictionary {bone_name: {channel: {array_index: F-Curve}}}
+  """
+  curves = defaultdict(lambda: defaultdict(dict))
+  for fcurve in action.fcurves:
+    parsed = parse_bone_data_path(fcurve.data_path)
+    if parsed is not None:
+      curves[parsed[0]][parsed[1]][fcurve.array_index] = fcurve
+  return curves
+
+def driven_bones(obj):
+  """
+  Finds the pose bones of an armature whose channels are not given by the F-Curves of its active action alone: the bones
+  with drivers or constraints, or every bone if the armature is evaluated with NLA strips (see nla_evaluated).
+  :param obj: Armature object
+  :return: Set with the names of the driven bones
+  """
+  driven = set(bone.name for bone in obj.pose.bones if len(bone.constraints) > 0)
+  if obj.animation_data is None:
+    return driven
+  if nla_evaluated(obj):
+    return set(obj.pose.bones.keys())
+  for driver in obj.animation_data.drivers:
+    parsed = parse_bone_data_path(driver.data_path)
+    if parsed is not None:
+      driven.add(parsed[0])
+  return driven
+
+def nla_evaluated(obj):
+  """
+  :param obj: Object
+  :return: Whether the object is evaluated with NLA strips on top of its active action
+  """
+  animation_data = obj.animation_data
+  if animation_data is None or not animation_data.use_nla:
+    return False
+  return any(not track.mute and len(track.strips) > 0 for track in animation_data.nla_tracks)
+
+def origin_actions(obj, actions='ACTIVE'):
+  """
+  Finds the actions of an armature that have to be transferred.
+  :param obj: Armature object
+  :param actions: 'ACTIVE' for the active action, 'NLA' for the actions of the NLA strips, 'ALL' for every action that
+    animates any bone of the armature, or a list with the names of the actions
+  :return: List of actions, without repetitions (names not found in bpy.data.actions are skipped)
+  """
+  if not isinstance(actions, str):
+    return [bpy.data.actions[name] for name in dict.fromkeys(actions) if name in bpy.data.actions]
+
+  if actions == 'ALL':
+    bones = set(obj.pose.bones.keys())
+    return [a for a in bpy.data.actions if any(name in bones for name in bone_fcurves(a))]
+
+  if obj.animation_data is None:
+    return []
+  if actions == 'NLA':
+    found = []
+    for track in obj.animation_data.nla_tracks:
+      for strip in track.strips:
+        if strip.action is not None and strip.action not in found:
+          found.append(strip.action)
+    return found
+  return [] if obj.animation_data.action is None else [obj.animation_data.action]
+
+def reset_pose(obj):
+  """
+  Sets every pose bone of an armature to its rest transform, so no channel keeps the value of a previous action.
+  :param obj: Armature object
+  """
+  n = len(obj.pose.bones)
+  obj.pose.bones.foreach_set('location', np.zeros(3 * n, dtype=np.float32))
+  obj.pose.bones.foreach_set('rotation_quaternion', np.tile(np.array([1, 0, 0, 0], dtype=np.float32), n))
+  obj.pose.bones.foreach_set('rotation_axis_angle', np.tile(np.array([0, 0, 1, 0], dtype=np.float32), n))
+  obj.pose.bones.foreach_set('rotation_euler', np.zeros(3 * n, dtype=np.float32))
+  obj.pose.bones.foreach_set('scale', np.ones(3 * n, dtype=np.float32))
+
+def copy_fcurve(source, action, data_path, index, group="", frame_range=None):
+  """
+  Copies the keyframes of an F-Curve onto a new F-Curve with another data path, replacing it if it already existed.
+  :param source: F-Curve to copy
+  :param action: Action in which the F-Curve is written
+  :param data_path: Data path of the new F-Curve
+  :param index: Index of the animated property of the new F-Curve
+  :param group: Name of the action group of the new F-Curve
+  :param frame_range: FrameRange instance whose time scale is applied to the keyframes. If None, the keyframes keep their frames.
+  :return: The written F-Curve
+  """
+  fcurve = action.fcurves.find(data_path, index=index)
+  if fcurve is not None:
+    action.fcurves.remove(fcurve)
+  fcurve = action.fcurves.new(data_path, index=index, action_group=group)
+  fcurve.extrapolation = source.extrapolation
+
+  n = len(source.keyframe_points)
+  fcurve.keyframe_points.add(n)
+  buffer = np.empty(2 * n, dtype=np.float32)
+  for attr in ('co', 'handle_left', 'handle_right'):
+    source.keyframe_points.foreach_get(attr, buffer)
+    if frame_range is not None:
+      buffer[0::2] = frame_range.output_frames(buffer[0::2])
+    fcurve.keyframe_points.foreach_set(attr, buffer)
+
+  #Enum properties are copied as the values of their items
+  modes = np.empty(n, dtype=np.int32)
+  for attr in ('interpolation', 'easing', 'handle_left_type', 'handle_right_type'):
+    source.keyframe_points.foreach_get(attr, modes)
+    fcurve.keyframe_points.foreach_set(attr, modes)
+
+  fcurve.update()
+  return fcurve
+
+def bone_data_path(bone_name, channel):
+  """
+  Builds the F-Curve data path of a channel of a pose bone.
+  :param bone_name: Name of the pose bone
+  :param channel: Name of the animated property (i.e. 'location')
+  :return: Data path in the form pose.bones["<bone_name>"].<channel>
+  """
+  return 'pose.bones["' + bpy.utils.escape_identifier(bone_name) + '"].' + channel
+
+def create_action(obj, name):
+  """
+  Creates a new action and assigns it as the active action of the object.
+  :param obj: Object which will hold the action
+  :param name: Name of the new action
+  :return: The new action
+  """
+  if obj.animation_data is None:
+    obj.animation_data_create()
+  action = bpy.data.actions.new(name)
+  obj.animation_data.action = action
+  return action
+
+def write_fcurve(action, data_path, index, frames, values, group="", interpolation=None):
+  """
+  Writes all the keyframes of an F-Curve at once, replacing the F-Curve if it already existed.
+  :param action: Action in which the F-Curve is written
+  :param data_path: Data path of the animated property
+  :param index: Index of the animated property (i.e. 0 for the X component of a location)
+  :param frames: Array with the frame of each keyframe
+  :param values: Array with the value of each keyframe
+  :param group: Name of the action group of the F-Curve
+  :param interpolation: Interpolation of the keyframes (i.e. 'LINEAR'). If None, the default interpolation is kept.
+  :return: The written F-Curve
+  """
+  co = np.empty(2 * len(frames), dtype=np.float32)
+  co[0::2] = frames
+  co[1::2] = values
+  return write_fcurve_keys(action, data_path, index, co, group, interpolation)
+
+def write_fcurve_keys(action, data_path, index, co, group="", interpolation=None):
+  """
+  Writes all the keyframes of an F-Curve at once from their coordinates, replacing the F-Curve if it already existed.
+  :param co: Array of size 2*N with the frame and value of each of the N keyframes, one after the other
+  :return: The written F-Curve (see write_fcurve for the rest of the parameters)
+  """
+  fcurve = action.fcurves.find(data_path, index=index)
+  if fcurve is not None:
+    action.fcurves.remove(fcurve)
+  fcurve = action.fcurves.new(data_path, index=index, action_group=group)
+
+  n = len(co) // 2
+  fcurve.keyframe_points.add(n)
+  fcurve.keyframe_points.foreach_set('co', co)
+  if interpolation is not None:
+    fcurve.keyframe_points.foreach_set('interpolation', np.full(n, keyframe_enum_value('interpolation', interpolation), dtype=np.int32))
+  fcurve.update()
+  return fcurve
+
+def keyframe_enum_value(prop, identifier):
+  """
+  :param prop: Name of an enum property of the keyframes (i.e. 'interpolation')
+  :param identifier: Identifier of one of its items (i.e. 'LINEAR')
+  :return: Value of the item, as foreach_get and foreach_set read and write it
+  """
+  return bpy.types.Keyframe.bl_rna.properties[prop].enum_items[identifier].value
+
+def write_bone_channel(action, bone_name, channel, frames, values, tolerance=None):
+  """
+  Writes the F-Curves of every component of a pose bone channel.
+  :param action: Action in which the F-Curves are written
+  :param bone_name: Name of the pose bone
+  :param channel: Name of the animated property (i.e. 'location')
+  :param frames: Array of size N with the frames of the keyframes
+  :param values: Array of size NxC with the values of the C components of the channel for each keyframe
+  :param tolerance: If not None, the keyframes are simplified with this maximum error (see simplify_keys) and interpolated linearly
+  :return: Number of written keyframes
+  """
+  return write_packed_channel(action, bone_name, channel, pack_bone_channel(frames, values, tolerance), None if tolerance is None else 'LINEAR')
+
+def pack_bone_channel(frames, values, tolerance=None):
+  """
+  Prepares the keyframes of every component of a pose bone channel as write_bone_channel writes them. It only uses NumPy,
+  so it can run in another thread.
+  :param frames: Array of size N with the frames of the keyframes
+  :param values: Array of size NxC with the values of the C components of the channel for each keyframe
+  :param tolerance: If not None, the keyframes are simplified with this maximum error (see simplify_keys)
+  :return: List with the coordinates of the keyframes of each component (see write_fcurve_keys)
+  """
+  frames = np.asarray(frames)
+  packed = []
+  for i in range(values.shape[1]):
+    keep = slice(None) if tolerance is None else simplify_keys(frames, values[:, i], tolerance)
+    co = np.empty(2 * len(frames[keep]), dtype=np.float32)
+    co[0::2] = frames[keep]
+    co[1::2] = values[keep, i]
+    packed.append(co)
+  return packed
+
+def write_packed_channel(action, bone_name, channel, packed, interpolation=None):
+  """
+  Writes the F-Curves of every component of a pose bone channel from the keyframes prepared by pack_bone_channel.
+  :param packed: List with the coordinates of the keyframes of each component
+  :param interpolation: Interpolation of the keyframes. If None, the default interpolation is kept.
+  :return: Number of written keyframes
+  """
+  data_path = bone_data_path(bone_name, channel)
+  for i, co in enumerate(packed):
+    write_fcurve_keys(action, data_path, i, co, bone_name, interpolation)
+  return sum(len(co) // 2 for co in packed)
+
+def rotation_channel(rotation_mode):
+  """
+  :param rotation_mode: Rotation mode of a pose bone ('QUATERNION', 'AXIS_ANGLE' or an Euler order such as 'XYZ')
+  :return: Channel that holds the rotation of the pose bone in that mode
+  """
+  return {'QUATERNION': "rotation_quaternion", 'AXIS_ANGLE': "rotation_axis_angle"}.get(rotation_mode, "rotation_euler")
+
+def fcurve_is_constant(fcurve):
+  """
+  :return: True if the F-Curve has the same value at every frame: all its keyframes and handles have the same value, and it has no modifiers
+  """
+  if len(fcurve.modifiers) > 0:
+    return False
+  n = len(fcurve.keyframe_points)
+  values = np.empty(6 * n, dtype=np.float32)
+  fcurve.keyframe_points.foreach_get('co', values[0:2 * n])
+  fcurve.keyframe_points.foreach_get('handle_left', values[2 * n:4 * n])
+  fcurve.keyframe_points.foreach_get('handle_right', values[4 * n:6 * n])
+  return bool(np.all(values[1::2] == values[1]))
+
+def plan_channels(pose_bone, channels, driven=False):
+  """
+  Finds the channels of an origin pose bone that an action animates, and which of them keep the same value all the time.
+  Only the rotation channel of the rotation mode of the bone is considered, since the others don't affect its pose.
+  :param pose_bone: Pose bone of the origin armature
+  :param channels: Dictionary {channel: {array_index: F-Curve}} of the bone (see bone_fcurves)
+  :param driven: Whether the bone is driven (see driven_bones), in which case all its channels are considered animated
+  :return: Dictionary {channel: 'ANIMATED' or 'CONSTANT'} with the channels that have keyframes
+  """
+  plan = {}
+  for channel in ("location", rotation_channel(pose_bone.rotation_mode), "scale"):
+    fcurves = [fc for fc in channels.get(channel, {}).values() if len(fc.keyframe_points) > 0]
+    if driven:
+      plan[channel] = 'ANIMATED'
+    elif len(fcurves) > 0:
+      plan[channel] = 'CONSTANT' if all(fcurve_is_constant(fc) for fc in fcurves) else 'ANIMATED'
+  return plan
+
+def plan_writes(origin_plan, origin_mode, target_mode, offset=False):
+  """
+  Decides which channels of a target bone are written from the channels of its origin bone (see plan_channels).
+  The rotation is written in the channel of the origin bone if both bones have the same rotation mode, and as a quaternion otherwise.
+  If an offset is applied to the channels (see transform_channels), the location and the rotation quaternion are written together.
+  :param origin_plan: Dictionary {channel: 'ANIMATED' or 'CONSTANT'} of the origin bone
+  :param origin_mode: Rotation mode of the origin bone
+  :param target_mode: Rotation mode of the target bone
+  :param offset: Whether an offset is applied to the channels
+  :return: Dictionary {channel: 'ANIMATED' or 'CONSTANT'} with the channels written on the target bone
+  """
+  source = rotation_channel(origin_mode)
+  writes = {}
+  if "location" in origin_plan:
+    writes["location"] = origin_plan["location"]
+  if source in origin_plan:
+    writes[source if origin_mode == target_mode and not offset else "rotation_quaternion"] = origin_plan[source]
+  if offset and len(writes) > 0:
+    writes["location"] = writes["rotation_quaternion"] = 'ANIMATED' if 'ANIMATED' in writes.values() else 'CONSTANT'
+  if "scale" in origin_plan:
+    writes["scale"] = origin_plan["scale"]
+  return writes
+
+def sources_of_writes(writes, origin_mode, offset=False):
+  """
+  :return: Set with the channels of the origin bone that have to be sampled to write the channels of the target bone (see plan_writes)
+  """
+  sources = set(rotation_channel(origin_mode) if channel.startswith("rotation") else channel for channel in writes)
+  if offset and len(writes) > 0:
+    sources.update(("location", rotation_channel(origin_mode)))
+  return sources
+
+def planned_values(samples, layout, writes, origin_mode, rotation=None, translation=None):
+  """
+  Computes the values of the channels of a target bone from the sampled channels of its origin bone.
+  :param samples: Array of size NxC with the sampled channels of the origin bone
+  :param layout: Dictionary {channel: slice} with the columns of each channel in samples (see channel_layout)
+  :param writes: Dictionary {channel: status} with the channels of the target bone (see plan_writes)
+  :param origin_mode: Rotation mode of the origin bone
+  :param rotation: 3x3 array with the rotation of the offset applied to the channels (see transform_channels), or None
+  :param translation: Array with the translation of the offset applied to the channels, or None
+  :return: Dictionary {channel: array of size NxK} with the values of the K components of each channel
+  """
+  source = rotation_channel(origin_mode)
+  values = {}
+  for channel in writes:
+    if not channel.startswith("rotation") or channel == source:
+      values[channel] = samples[:, layout[channel if not channel.startswith("rotation") else source]]
+    else:
+      values[channel] = rotations_to_quaternions(samples[:, layout[source]], origin_mode)
+  if rotation is not None and len(writes) > 0:
+    channels = transform_channels(np.concatenate([samples[:, layout["location"]], values["rotation_quaternion"]], axis=1), rotation, translation)
+    values["location"], values["rotation_quaternion"] = channels[:, 0:3], channels[:, 3:7]
+  return values
+
+def pack_planned_channels(frames, samples, layout, writes, origin_mode, rotation=None, translation=None, tolerances=None):
+  """
+  Prepares the keyframes of the channels of a target bone from the sampled channels of its origin bone (see planned_values).
+  Constant channels get a single keyframe. It only uses NumPy, so it can run in another thread while Blender keeps evaluating the scene.
+  :param frames: Array of size N with the frames in which the keyframes are written
+  :param tolerances: Dictionary {channel: tolerance} with the simplification tolerance of each channel, or None (see simplify_keys)
+  :return: Dictionary {channel: packed keyframes} (see pack_bone_channel)
+  """
+  tolerances = tolerances or {}
+  packed = {}
+  for channel, values in planned_values(samples, layout, writes, origin_mode, rotation, translation).items():
+    if writes[channel] == 'CONSTANT':
+      packed[channel] = pack_bone_channel(frames[0:1], values[0:1])
+    else:
+      packed[channel] = pack_bone_channel(frames, values, tolerances.get(channel))
+  return packed
+
+def simplify_keys(frames, values, tolerance):
+  """
+  Finds the keyframes of a curve that can be removed while keeping the linear interpolation of the remaining ones
+  within a maximum error of the original values (Ramer-Douglas-Peucker algorithm).
+  All the segments of each level of the recursion are processed at once.
+  :param frames: Array of size N with the frames of the keyframes, in increasing order
+  :param values: Array of size N with the values of the keyframes
+  :param tolerance: Maximum difference between the original values and the interpolated ones
+  :return: Boolean array of size N, True for the keyframes that have to be kept
+  """
+  frames = np.asarray(frames, dtype=float)
+  values = np.asarray(values, dtype=float)
+  n = len(frames)
+  keep = np.zeros(n, dtype=bool)
+  if n == 0:
+    return keep
+  keep[[0, -1]] = True
+
+  starts = np.array([0])
+  ends = np.array([n - 1])
+  while len(starts) > 0:
+    counts = ends - starts - 1
+    valid = counts > 0
+    starts, ends, counts = starts[valid], ends[valid], counts[valid]
+    if len(starts) == 0:
+      break
+
+    #Indices of the keyframes inside every segment, and the segment each one belongs to
+    segment = np.repeat(np.arange(len(starts)), counts)
+    idx = np.repeat(starts + 1 - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+    s = starts[segment]
+    e = ends[segment]
+
+    t = (frames[idx] - frames[s]) / (frames[e] - frames[s])
+    error = np.abs(values[idx] - (values[s] + t * (values[e] - values[s])))
+    max_error = np.zeros(len(starts))
+    np.maximum.at(max_error, segment, error)
+
+    #Split the segments at their keyframe with the largest error, if it is above the tolerance
+    split = max_error > tolerance
+    is_max = (error == max_error[segment]) & split[segment]
+    _, first = np.unique(segment[is_max], return_index=True)
+    pivots = idx[is_max][first]
+    keep[pivots] = True
+
+    starts = np.concatenate([starts[split], pivots])
+    ends = np.concatenate([pivots, ends[split]])
+  return keep
+
+def simplify_fcurves(fcurves, tolerance):
+  """
+  Removes the redundant keyframes of already written F-Curves (see simplify_keys). The simplified F-Curves are interpolated linearly.
+  :param fcurves: List of F-Curves
+  :param tolerance: Maximum difference between the original values and the interpolated ones
+  :return: Number of removed keyframes
+  """
+  removed = 0
+  for fcurve in list(fcurves):
+    n = len(fcurve.keyframe_points)
+    co = np.empty(2 * n, dtype=np.float32)
+    fcurve.keyframe_points.foreach_get('co', co)
+    keep = simplify_keys(co[0::2], co[1::2], tolerance)
+    if keep.all():
+      continue
+    removed += n - np.count_nonzero(keep)
+    group = fcurve.group.name if fcurve.group is not None else ""
+    write_fcurve(fcurve.id_data, fcurve.data_path, fcurve.array_index, co[0::2][keep], co[1::2][keep], group, 'LINEAR')
+  return removed
+
+#Number of samples of each bucket of frames of the incremental transfers (see bucket_hashes)
+transfer_bucket_size = 32
+#Custom properties with the fingerprints of an incremental transfer (in the target action, with the hashes of the buckets of every
+#bone packed in the bytes of buckets_property) and the offsets applied to the rest pose (in the target armature)
+record_property = "animation_transfer"
+buckets_property = "animation_transfer_buckets"
+offsets_property = "animation_transfer_offsets"
+#Custom property of the target armatures with the JSON file of their relations (see AnimationTransferTargets)
+relations_property = "animation_transfer_relations"
+
+def bucket_hashes(channels, bucket_frames):
+  """
+  Hashes the keyframes of the channels of a pose bone that determine its animation in each bucket of frames.
+  The hash of a bucket covers the keyframes inside it and the previous and next ones, so it changes whenever the curves
+  are modified anywhere that affects the interpolated values inside the bucket. The modes of the keyframes (interpolation,
+  easing and handle types) are hashed as the values of their enum items, which are the same in every session.
+  :param channels: Dictionary {channel: {array_index: F-Curve}} of the pose bone (see bone_fcurves)
+  :param bucket_frames: List of tuples (first_frame, last_frame) of each bucket
+  :return: Array with the 64 bit hash of each bucket
+  """
+  hashes = [hashlib.blake2b(digest_size=8) for _ in bucket_frames]
+  first = np.array([b[0] for b in bucket_frames], dtype=float)
+  last = np.array([b[1] for b in bucket_frames], dtype=float)
+
+  for channel in bone_channels:
+    for index, fcurve in sorted(channels.get(channel, {}).items()):
+      n = len(fcurve.keyframe_points)
+      keys = np.empty((n, 10), dtype=np.float32)
+      buffer = np.empty(2 * n, dtype=np.float32)
+      for c, attr in enumerate(('co', 'handle_left', 'handle_right')):
+        fcurve.keyframe_points.foreach_get(attr, buffer)
+        keys[:, 2 * c:2 * c + 2] = buffer.reshape(n, 2)
+      modes = np.empty(n, dtype=np.int32)
+      for c, attr in enumerate(('interpolation', 'easing', 'handle_left_type', 'handle_right_type')):
+        fcurve.keyframe_points.foreach_get(attr, modes)
+        keys[:, 6 + c] = modes
+      header = (channel + str(index) + fcurve.extrapolation + str(len(fcurve.modifiers))).encode('utf-8')
+
+      frames = keys[:, 0]
+      start = np.clip(np.searchsorted(frames, first, side='right') - 1, 0, None)
+      end = np.searchsorted(frames, last, side='left') + 1
+      for b, h in enumerate(hashes):
+        h.update(header)
+        h.update(keys[start[b]:end[b]].tobytes())
+
+  return np.frombuffer(b"".join(h.digest() for h in hashes), dtype='<u8')
+
+def dirty_spans(dirty, bucket_size, n):
+  """
+  Joins consecutive dirty buckets into spans of samples.
+  :param dirty: Boolean array with, for each bucket, whether it has to be rewritten
+  :param bucket_size: Number of samples of each bucket
+  :param n: Total number of samples
+  :return: List of tuples (first, end) with the indices of the samples of each span (end not included)
+  """
+  spans = []
+  for b in np.flatnonzero(dirty):
+    first, end = b * bucket_size, min((b + 1) * bucket_size, n)
+    if len(spans) > 0 and spans[-1][1] == first:
+      spans[-1] = (spans[-1][0], end)
+    else:
+      spans.append((first, end))
+  return spans
+
+def splice_bone_channel(action, bone_name, channel, frames, values, tolerance=None):
+  """
+  Replaces the keyframes of the F-Curves of a pose bone channel from the first to the last of the given frames,
+  keeping the keyframes outside of them.
+  :param action: Action in which the F-Curves are written
+  :param bone_name: Name of the pose bone
+  :param channel: Name of the animated property (i.e. 'location')
+  :param frames: Array of size N with the frames of the new keyframes, in increasing order
+  :param values: Array of size NxC with the values of the C components of the channel for each new keyframe
+  :param tolerance: If not None, the new keyframes are simplified with this maximum error (see simplify_keys) and all the
+    keyframes are interpolated linearly
+  :return: Number of written keyframes
+  """
+  data_path = bone_data_path(bone_name, channel)
+  frames = np.asarray(frames, dtype=float)
+  written = 0
+  for i in range(values.shape[1]):
+    new_frames, new_values = frames, values[:, i]
+    if tolerance is not None:
+      keep = simplify_keys(frames, values[:, i], tolerance)
+      new_frames, new_values = frames[keep], values[keep, i]
+    written += len(new_frames)
+
+    fcurve = action.fcurves.find(data_path, index=i)
+    if fcurve is not None:
+      n = len(fcurve.keyframe_points)
+      co = np.empty(2 * n, dtype=np.float32)
+      fcurve.keyframe_points.foreach_get('co', co)
+      before = co[0::2] < frames[0]
+      after = co[0::2] > frames[-1]
+      new_frames = np.concatenate([co[0::2][before], new_frames, co[0::2][after]])
+      new_values = np.concatenate([co[1::2][before], new_values, co[1::2][after]])
+    write_fcurve(action, data_path, i, new_frames, new_values, bone_name, None if tolerance is None else 'LINEAR')
+  return written
+
+def remove_bone_fcurves(action, bone_name, channels):
+  """
+  Removes the F-Curves of some channels of a pose bone.
+  :param action: Action with the F-Curves
+  :param bone_name: Name of the pose bone
+  :param channels: List of channels (i.e. 'location')
+  """
+  data_paths = set(bone_data_path(bone_name, channel) for channel in channels)
+  for fcurve in [fc for fc in action.fcurves if fc.data_path in data_paths]:
+    action.fcurves.remove(fcurve)
 
-def get_pose_bone(armature, idx):
-  return list(armature.pose.bones)[idx]
 
 bone_names = ["root", "hip", "spine_01", "spine_02", "spine_03", \
   "head", "head_end", "jaw", "jaw_end", "neck", \
@@ -59,12 +843,61 @@ class PanelOne(bpy.types.Panel):
     def draw(self, context):
       col = self.layout.column(align=True)
       col.label(text="Transfer")
-      col.operator("animation.transfer_animation", text="Legacy Animation Transfer")
-      col.operator("animation.transfer_animation_custom", text="Animation Transfer (JSON)")
-      
+      wm = context.window_manager
+      if wm.transfer_running:
+        text = "Transferring {:.0%} (Esc to cancel)".format(wm.transfer_progress)
+        if hasattr(col, "progress"):
+          col.progress(factor=wm.transfer_progress, type='BAR', text=text)
+        else:
+          col.label(text=text)
+      col = col.column(align=True)
+      col.enabled = not wm.transfer_running
+      if context.scene.transfer_interactive:
+        col.operator("animation.transfer_animation_modal", text="Legacy Animation Transfer")
+        col.operator("animation.transfer_animation_custom_modal", text="Animation Transfer (JSON)")
+      else:
+        col.operator("animation.transfer_animation", text="Legacy Animation Transfer")
+        col.operator("animation.transfer_animation_custom", text="Animation Transfer (JSON)")
+      col.operator("animation.transfer_animation_targets", text="Animation Transfer to Selected (JSON)")
+      col.operator("animation.transfer_animation_clip", text="Animation Transfer (Clip)")
+      col.prop(context.scene, "transfer_interactive")
+      col.prop(context.scene, "transfer_clip_relations")
+      col.prop(context.scene, "transfer_bulk_write")
+      col.prop(context.scene, "transfer_curve_copy")
+      col.prop(context.scene, "transfer_channel_offsets")
+      col.prop(context.scene, "transfer_simplify")
+      if context.scene.transfer_simplify:
+        col.prop(context.scene, "transfer_simplify_location")
+        col.prop(context.scene, "transfer_simplify_rotation")
+      col.prop(context.scene, "transfer_use_frame_range")
+      if context.scene.transfer_use_frame_range:
+        col.prop(context.scene, "transfer_frame_start")
+        col.prop(context.scene, "transfer_frame_end")
+      col.prop(context.scene, "transfer_frame_step")
+      col.prop(context.scene, "transfer_time_scale")
+      col.prop(context.scene, "transfer_actions")
+      if context.scene.transfer_actions == 'NAMES':
+        col.prop(context.scene, "transfer_action_names")
+      col.prop(context.scene, "transfer_incremental")
+      col.prop(context.scene, "transfer_sample_window")
+      col.prop(context.scene, "transfer_export_clip")
+      if context.scene.transfer_export_clip:
+        col.prop(context.scene, "transfer_clip_path")
+        col.prop(context.scene, "transfer_clip_half_location")
+        col.prop(context.scene, "transfer_clip_quantize_rotation")
+
+      col = self.layout.column(align=True)
+      col.label(text="Profiling")
+      col.prop(context.scene, "transfer_profile")
+      if context.scene.transfer_profile:
+        col.prop(context.scene, "transfer_profile_cprofile")
+        col.prop(context.scene, "transfer_profile_path")
+
       col = self.layout.column(align=True)
       col.label(text="Make stationary")
       col.prop(context.scene, "root_bone_name")
+      col.prop(context.scene, "root_strip_axes")
+      col.prop(context.scene, "root_motion_mode")
       col.operator("animation.remove_root_movement", text="Make bone stationary")
       
 
@@ -77,16 +910,6 @@ class MyEuler(mathutils.Euler):
   def to_quaternion(self):
     return self.to_matrix().to_quaternion()
 
-def euler_zxz(values):
-  """
-  Creates a Euler rotation in notation ZXZ from a list of values.
-  :param values: List of values
-  :return: Euler rotation in notation ZXZ
-  """
-  rotation = MyEuler((values[0], values[1], 0), 'ZXY')
-  rotation.rotate(MyEuler((values[2], 0, 0), 'ZXY'))
-  return rotation
-
 def axis_angle_to_quaternion(axis, angle):
   qx = axis[0] * np.sin(angle/2)
   qy = axis[1] * np.sin(angle/2)
@@ -94,12 +917,196 @@ def axis_angle_to_quaternion(axis, angle):
   qw = np.cos(angle/2)
   return mathutils.Quaternion((qx, qy, qz, qw))
 
+# -----------------------------------------
+# Vectorised rotations. Quaternions are stored as (w, x, y, z), like in mathutils.
+
+def axis_rotation_matrices(angles, axis):
+  """
+  Builds the rotation matrices about one of the main axes.
+  :param angles: Array of size N with the angles (in radians)
+  :param axis: 'X', 'Y' or 'Z'
+  :return: Array of size Nx3x3 with the rotation matrices
+  """
+  angles = np.asarray(angles, dtype=float)
+  c = np.cos(angles)
+  s = np.sin(angles)
+  i, j = {'X': (1, 2), 'Y': (2, 0), 'Z': (0, 1)}[axis]
+  m = np.zeros(angles.shape + (3, 3))
+  m[..., 3 - i - j, 3 - i - j] = 1
+  m[..., i, i] = c
+  m[..., j, j] = c
+  m[..., i, j] = -s
+  m[..., j, i] = s
+  return m
+
+def quaternions_to_matrices(q):
+  """
+  :param q: Array of size Nx4 with the quaternions (w, x, y, z). They don't need to be normalized.
+  :return: Array of size Nx3x3 with the rotation matrices
+  """
+  q = np.asarray(q, dtype=float)
+  q = q / np.linalg.norm(q, axis=-1, keepdims=True)
+  w, x, y, z = q[..., 0], q[..., 1], q[..., 2], q[..., 3]
+  m = np.empty(q.shape[:-1] + (3, 3))
+  m[..., 0, 0] = 1 - 2 * (y * y + z * z)
+  m[..., 0, 1] = 2 * (x * y - z * w)
+  m[..., 0, 2] = 2 * (x * z + y * w)
+  m[..., 1, 0] = 2 * (x * y + z * w)
+  m[..., 1, 1] = 1 - 2 * (x * x + z * z)
+  m[..., 1, 2] = 2 * (y * z - x * w)
+  m[..., 2, 0] = 2 * (x * z - y * w)
+  m[..., 2, 1] = 2 * (y * z + x * w)
+  m[..., 2, 2] = 1 - 2 * (x * x + y * y)
+  return m
+
+def matrices_to_quaternions(m):
+  """
+  :param m: Array of size Nx3x3 with rotation matrices
+  :return: Array of size Nx4 with the quaternions (w, x, y, z), with w >= 0
+  """
+  m = np.asarray(m, dtype=float)
+  m00, m01, m02 = m[..., 0, 0], m[..., 0, 1], m[..., 0, 2]
+  m10, m11, m12 = m[..., 1, 0], m[..., 1, 1], m[..., 1, 2]
+  m20, m21, m22 = m[..., 2, 0], m[..., 2, 1], m[..., 2, 2]
+
+  #Compute the quaternion from the largest of its components, which is the most stable choice
+  candidates = np.stack([m00 + m11 + m22, m00 - m11 - m22, m11 - m00 - m22, m22 - m00 - m11], axis=-1)
+  largest = np.argmax(candidates, axis=-1)
+  r = np.sqrt(np.maximum(1 + np.take_along_axis(candidates, largest[..., None], axis=-1)[..., 0], 1e-12)) / 2
+  f = 1 / (4 * r)
+
+  q = np.stack([
+    np.stack([r, (m21 - m12) * f, (m02 - m20) * f, (m10 - m01) * f], axis=-1),
+    np.stack([(m21 - m12) * f, r, (m01 + m10) * f, (m02 + m20) * f], axis=-1),
+    np.stack([(m02 - m20) * f, (m01 + m10) * f, r, (m12 + m21) * f], axis=-1),
+    np.stack([(m10 - m01) * f, (m02 + m20) * f, (m12 + m21) * f, r], axis=-1)], axis=-2)
+  q = np.take_along_axis(q, largest[..., None, None], axis=-2)[..., 0, :]
+  return np.where(q[..., :1] < 0, -q, q)
+
+def quaternion_multiply(a, b):
+  """
+  Multiplies two arrays of quaternions element-wise (a @ b).
+  :param a: Array of size Nx4 with quaternions (w, x, y, z)
+  :param b: Array of size Nx4 with quaternions (w, x, y, z)
+  :return: Array of size Nx4 with the products
+  """
+  a = np.asarray(a, dtype=float)
+  b = np.asarray(b, dtype=float)
+  aw, ax, ay, az = a[..., 0], a[..., 1], a[..., 2], a[..., 3]
+  bw, bx, by, bz = b[..., 0], b[..., 1], b[..., 2], b[..., 3]
+  return np.stack([
+    aw * bw - ax * bx - ay * by - az * bz,
+    aw * bx + ax * bw + ay * bz - az * by,
+    aw * by - ax * bz + ay * bw + az * bx,
+    aw * bz + ax * by - ay * bx + az * bw], axis=-1)
+
+def eulers_to_quaternions(angles, order='XYZ'):
+  """
+  :param angles: Array of size Nx3 with Euler angles about X, Y and Z (in radians), like the rotation_euler of the pose bones
+  :param order: Order in which the rotations about each axis are applied, like the rotation mode of the pose bones
+  :return: Array of size Nx4 with the quaternions (w, x, y, z)
+  """
+  angles = np.asarray(angles, dtype=float)
+  m = np.broadcast_to(np.identity(3), angles.shape[:-1] + (3, 3))
+  for axis in order:
+    m = axis_rotation_matrices(angles[..., 'XYZ'.index(axis)], axis) @ m
+  return matrices_to_quaternions(m)
+
+def rotations_to_quaternions(values, rotation_mode):
+  """
+  :param values: Array of size NxK with the values of the rotation channel of pose bones (see rotation_channel)
+  :param rotation_mode: Rotation mode of the pose bones
+  :return: Array of size Nx4 with the quaternions (w, x, y, z)
+  """
+  values = np.asarray(values, dtype=float)
+  if rotation_mode == 'QUATERNION':
+    return values
+  elif rotation_mode == 'AXIS_ANGLE':
+    #Stored as (angle, x, y, z)
+    return matrices_to_quaternions(axis_angle_to_matrices(values[:, 1:4], values[:, 0]))
+  return eulers_to_quaternions(values, rotation_mode)
+
+def axis_angle_to_matrices(axes, angles):
+  """
+  :param axes: Array of size Nx3 with the rotation axes. They don't need to be normalized.
+  :param angles: Array of size N with the angles (in radians)
+  :return: Array of size Nx3x3 with the rotation matrices
+  """
+  axes = np.asarray(axes, dtype=float)
+  axes = axes / np.linalg.norm(axes, axis=-1, keepdims=True)
+  angles = np.asarray(angles, dtype=float)[..., None, None]
+  K = np.zeros(axes.shape[:-1] + (3, 3))
+  K[..., 0, 1] = -axes[..., 2]
+  K[..., 0, 2] = axes[..., 1]
+  K[..., 1, 0] = axes[..., 2]
+  K[..., 1, 2] = -axes[..., 0]
+  K[..., 2, 0] = -axes[..., 1]
+  K[..., 2, 1] = axes[..., 0]
+  return np.identity(3) + np.sin(angles) * K + (1 - np.cos(angles)) * (K @ K)
+
+def decode_rotations(codification, values):
+  """
+  Decodes many orientations with the same codification at once.
+  :param codification: One of the following (with the size of values):
+    - 'quaternion': Nx4, [w, x, y, z] (the same order as mathutils.Quaternion)
+    - 'rpy': Nx3, [roll, pitch, yaw], applied as the product of the rotations about X, Y and Z
+    - 'euler': Nx3, [phi (Z), theta (X), psi (Z)], applied as the product of the rotations about Z, X and Z
+    - 'axis_angle': Nx3x4, three [axis_x, axis_y, axis_z, angle] rotations, applied as their product
+    - 'rotation_matrix': Nx3x3
+  :param values: Array with the values of the orientations
+  :return: Array of size Nx3x3 with the rotation matrices
+  :raises:
+    ValueError - If the codification is unknown
+  """
+  values = np.asarray(values, dtype=float)
+  if codification == 'quaternion':
+    return quaternions_to_matrices(values)
+  elif codification == 'rpy':
+    return axis_rotation_matrices(values[:, 0], 'X') @ axis_rotation_matrices(values[:, 1], 'Y') @ axis_rotation_matrices(values[:, 2], 'Z')
+  elif codification == 'euler':
+    return axis_rotation_matrices(values[:, 0], 'Z') @ axis_rotation_matrices(values[:, 1], 'X') @ axis_rotation_matrices(values[:, 2], 'Z')
+  elif codification == 'axis_angle':
+    rot = np.broadcast_to(np.identity(3), (len(values), 3, 3))
+    for i in range(values.shape[1]):
+      rot = rot @ axis_angle_to_matrices(values[:, i, 0:3], values[:, i, 3])
+    return rot
+  elif codification == 'rotation_matrix':
+    return values.reshape(-1, 3, 3)
+  else:
+    raise ValueError("Unknown codification: " + codification)
+
+def transform_channels(channels, rotation, translation):
+  """
+  Changes the basis of the animation channels of a bone, so that a target bone whose rest pose is not modified deforms
+  the same as if the offset was applied to its rest pose. Being T the offset and L the local transformation of
+  each frame, the new local transformation is T @ L @ T^-1.
+  :param channels: Array of size Nx7 with the location (x, y, z) and the rotation quaternion (w, x, y, z) of each frame
+  :param rotation: Array of size 3x3 with the rotation of the offset
+  :param translation: Array of size 3 with the translation of the offset
+  :return: Array of size Nx7 with the transformed channels
+  """
+  r = matrices_to_quaternions(rotation[None])[0]
+  r_inv = r * np.array([1, -1, -1, -1])
+
+  result = np.empty_like(channels)
+  result[:, 3:7] = quaternion_multiply(quaternion_multiply(r, channels[:, 3:7]), r_inv)
+  result[:, 0:3] = channels[:, 0:3] @ rotation.T + translation - quaternions_to_matrices(result[:, 3:7]) @ translation
+  return result
+
 class Transformation():
   def Identity():
     R = mathutils.Matrix.Identity(3)
     t = mathutils.Vector((0, 0, 0))
     return Transformation(R, t)
 
+  def from_matrix(matrix):
+    """
+    :param matrix: 4x4 array with a rigid transformation
+    :return: Transformation with the rotation and translation of the matrix
+    """
+    matrix = np.asarray(matrix)
+    return Transformation(mathutils.Matrix(matrix[0:3, 0:3].tolist()), mathutils.Vector(matrix[0:3, 3].tolist()))
+
   def __init__(self, ori, trans):
     self._ori = ori
     self._trans = trans
@@ -119,68 +1126,522 @@ class Transformation():
     return mathutils.Matrix.Translation(loc) @ rot.to_4x4()
 
 
+  def get_rotation(self):
+    if self._ori is None:
+      return mathutils.Matrix.Identity(3)
+    return self._ori.to_3x3()
+
+  def get_translation(self):
+    if self._trans is None:
+      return mathutils.Vector((0, 0, 0))
+    return mathutils.Vector(self._trans)
+
+  def is_identity(self):
+    """
+    :return: True if the transformation does not modify the bone it is applied to
+    """
+    if self._ori is not None and not np.allclose(np.array(self.get_rotation()), np.identity(3)):
+      return False
+    if self._trans is not None and not np.allclose(np.array(self._trans), 0):
+      return False
+    return True
+
   def apply(self, target_object, target_bone_key):
-    if self._ori is not None or self.trans is not None:
-      
-      armature_modifiers = []
+    apply_offsets(target_object, [(target_bone_key, self)])
+
 
-      #Unassign the object of the armature modifier for all the meshes
-      for mesh in target_object.children:
-        for mod in mesh.modifiers:
-          if mod.type == 'ARMATURE' and mod.object == target_object:
-            armature_modifiers.append(mod)
-            mod.object = None
+def apply_offsets(target_object, offsets):
+  """
+  Applies several transformations to the rest pose of the bones of an armature, in a single edit mode session.
+  Identity transformations are skipped. If a bone appears more than once, its transformations are applied in order.
+  :param target_object: Armature object whose bones are transformed
+  :param offsets: List of tuples (bone_name, Transformation)
+  :return: Number of bones whose rest pose was modified
+  """
+  #Read the rest matrices before entering edit mode and accumulate the transformations of each bone
+  matrices = {}
+  for name, offset in offsets:
+    if offset.is_identity():
+      continue
+    if name not in matrices:
+      matrices[name] = target_object.data.bones[name].matrix_local.copy()
+    matrices[name] = matrices[name] @ offset.build_matrix()
+
+  if len(matrices) == 0:
+    return 0
 
-      bpy.ops.object.mode_set(mode='EDIT')
+  #Unassign the object of the armature modifier for all the meshes
+  armature_modifiers = []
+  for mesh in target_object.children:
+    for mod in mesh.modifiers:
+      if mod.type == 'ARMATURE' and mod.object == target_object:
+        armature_modifiers.append(mod)
+        mod.object = None
 
-      edit_bone = target_object.data.edit_bones.get(target_bone_key)
-      pose_bone = target_object.pose.bones.get(target_bone_key)
+  active = bpy.context.view_layer.objects.active
+  bpy.context.view_layer.objects.active = target_object
+  bpy.ops.object.mode_set(mode='EDIT')
 
-      #Disconnect the bases of the bones from one another (so they don't move with this transformation)
-      edit_bone.use_connect = False
-      for c in edit_bone.children:
-        c.use_connect = False
+  for name, T in matrices.items():
+    edit_bone = target_object.data.edit_bones.get(name)
 
-      bpy.ops.armature.select_all(action='DESELECT')
-      edit_bone.select = True
+    #Disconnect the bases of the bones from one another (so they don't move with this transformation)
+    edit_bone.use_connect = False
+    for c in edit_bone.children:
+      c.use_connect = False
 
-      bone_head_matrix = pose_bone.matrix
-      
+    edit_bone.matrix = T
 
-      if self._ori is not None:
-            # Need to transform the orientation to WORLD space
-        #Translate to (0,0,0), rotate and then bring back to original position
-        R = self._ori.to_4x4()
+  bpy.ops.object.mode_set(mode='OBJECT')
+  bpy.context.view_layer.objects.active = active
 
-      if self._trans is not None:
-        R = mathutils.Matrix.Translation(self._trans) @ R
+  #Once the transformation has been completed, reassign the object in the armature modifier
+  for mod in armature_modifiers:
+    mod.object = target_object
 
-      
-      
-      T = bone_head_matrix @ R
-      edit_bone.matrix = T
+  return len(matrices)
 
-      bpy.ops.object.mode_set(mode='OBJECT')
+def connect_bones(armature, connected):
+  """
+  Sets again whether the bones of an armature are connected to their parents (i.e. after apply_offsets disconnected them),
+  in a single edit mode session.
+  :param armature: Armature object
+  :param connected: Dictionary {bone_name: use_connect} with the state of the bones
+  :return: Number of bones that changed
+  """
+  bones = armature.data.bones
+  changed = [name for name, use_connect in connected.items() if name in bones and bones[name].use_connect != use_connect]
+  if len(changed) == 0:
+    return 0
 
-      #Once the transformation has been completed, reassign the object in the armature modifier
-      for mesh in target_object.children:
-        for mod in mesh.modifiers:
-          if mod.type == 'ARMATURE' and mod.object == None:
-            mod.object = target_object
+  active = bpy.context.view_layer.objects.active
+  bpy.context.view_layer.objects.active = armature
+  bpy.ops.object.mode_set(mode='EDIT')
+  for name in changed:
+    armature.data.edit_bones[name].use_connect = connected[name]
+  bpy.ops.object.mode_set(mode='OBJECT')
+  bpy.context.view_layer.objects.active = active
+  return len(changed)
+
+def applied_offsets(armature):
+  """
+  :param armature: Armature object
+  :return: Dictionary {bone_name: 4x4 array} with the offsets applied to the rest pose of its bones by the transfers (see offsets_property)
+  """
+  return {name: np.array(m).reshape(4, 4) for name, m in json.loads(armature.data.get(offsets_property, "{}")).items()
+          if name in armature.data.bones}
+
+def offset_changes(old, new):
+  """
+  Finds the transformations that turn the offsets applied to the rest pose of some bones into other offsets.
+  :param old: Dictionary {bone_name: 4x4 array} with the applied offsets
+  :param new: Dictionary {bone_name: 4x4 array} with the new offsets
+  :return: List of tuples (bone_name, Transformation) for the bones whose offsets differ (see apply_offsets)
+  """
+  identity = np.identity(4)
+  changes = []
+  for name in sorted(set(old) | set(new)):
+    a, b = old.get(name, identity), new.get(name, identity)
+    if not np.allclose(a, b):
+      changes.append((name, Transformation.from_matrix(np.linalg.inv(a) @ b)))
+  return changes
+
+
+class FrameRange():
+  """
+  Frames in which an animation is sampled and frames in which the samples are written.
+  Samples are taken every step frames from start to end (both included), and written with their distance to start
+  multiplied by time_scale, so an animation can be resampled (i.e. step=4 and time_scale=0.25 turn 120 fps into 30 fps).
+  """
+  def from_action(action, options):
+    """
+    Builds the frame range of an action, unless the options set another one.
+    :param action: Action whose frame range is used
+    :param options: TransferOptions instance
+    """
+    if options.frame_range is not None:
+      start, end = options.frame_range
+    else:
+      start, end = floor(action.frame_range[0]), ceil(action.frame_range[1])
+    return FrameRange(start, end, options.frame_step, options.time_scale)
+
+  def __init__(self, start, end, step=1.0, time_scale=1.0):
+    self.start = start
+    self.end = end
+    self.step = step
+    self.time_scale = time_scale
+
+  def sample_frames(self):
+    """
+    :return: Array with the frames in which the animation is sampled
+    """
+    n = floor((self.end - self.start) / self.step + 1e-6) + 1
+    return self.start + self.step * np.arange(max(n, 0))
+
+  def output_frames(self, frames=None):
+    """
+    :param frames: Array of frames of the sampled animation. If None, the frames returned by sample_frames.
+    :return: Array with the frames in which the given frames are written
+    """
+    if frames is None:
+      frames = self.sample_frames()
+    return self.start + (frames - self.start) * self.time_scale
+
+
+class TransferOptions():
+  """
+  Settings that control how the animation is written on the target armature.
+  """
+  def from_scene(scene):
+    frame_range = (scene.transfer_frame_start, scene.transfer_frame_end) if scene.transfer_use_frame_range else None
+    actions = scene.transfer_actions
+    if actions == 'NAMES':
+      actions = [name.strip() for name in scene.transfer_action_names.split(',') if name.strip() != ""]
+    return TransferOptions(bulk_write=scene.transfer_bulk_write, curve_copy=scene.transfer_curve_copy,
+                           channel_offsets=scene.transfer_channel_offsets, simplify=simplify_tolerances(scene),
+                           frame_range=frame_range, frame_step=scene.transfer_frame_step, time_scale=scene.transfer_time_scale,
+                           actions=actions, export_clip=bpy.path.abspath(scene.transfer_clip_path) if scene.transfer_export_clip else None,
+                           clip_half_location=scene.transfer_clip_half_location,
+                           clip_quantize_rotation=scene.transfer_clip_quantize_rotation, incremental=scene.transfer_incremental,
+                           sample_window=scene.transfer_sample_window)
+
+  def __init__(self, bulk_write=True, curve_copy=False, channel_offsets=False, simplify=None,
+               frame_range=None, frame_step=1.0, time_scale=1.0, actions='ACTIVE',
+               export_clip=None, clip_half_location=True, clip_quantize_rotation=True, incremental=False, sample_window=4096):
+    self.bulk_write = bulk_write
+    self.curve_copy = curve_copy
+    self.channel_offsets = channel_offsets
+    #Dictionary {channel: tolerance} with the maximum error when simplifying the keyframes of each channel, or None to keep them all
+    self.simplify = simplify
+    #Tuple (start, end) with the frames to sample, or None to sample the frame range of the action
+    self.frame_range = frame_range
+    self.frame_step = frame_step
+    self.time_scale = time_scale
+    #Actions of the origin armature that are transferred (see origin_actions)
+    self.actions = actions
+    #Clip file (see ClipWriter) in which the transferred animation is exported, or None to not export it
+    self.export_clip = export_clip
+    self.clip_half_location = clip_half_location
+    self.clip_quantize_rotation = clip_quantize_rotation
+    #Whether only the bones and frames that changed since the previous transfer to the same action are rewritten
+    self.incremental = incremental
+    #Maximum number of frames whose samples are kept in memory. Longer animations are sampled in windows of this size into a
+    #temporary file (see track_buffer). 0 keeps every frame in memory.
+    self.sample_window = sample_window
+
+  def frame_range_error(self):
+    """
+    :return: Message explaining why the frame range and step select no frames, or None if they are valid
+    """
+    if self.frame_step <= 0:
+      return "The frame step must be greater than 0"
+    if self.frame_range is not None and self.frame_range[1] < self.frame_range[0]:
+      return "The end frame (" + str(self.frame_range[1]) + ") is before the start frame (" + str(self.frame_range[0]) + ")"
+    return None
+
+  def tolerance(self, channel):
+    if self.simplify is None:
+      return None
+    if channel in ("rotation_euler", "rotation_axis_angle"):
+      #Every rotation channel is simplified with the tolerance of the rotations
+      return self.simplify.get(channel, self.simplify.get("rotation_quaternion"))
+    return self.simplify.get(channel)
+
+
+def simplify_tolerances(scene):
+  """
+  :return: Dictionary {channel: tolerance} with the simplification tolerances set in the scene, or None if simplification is disabled
+  """
+  if not scene.transfer_simplify:
+    return None
+  return {"location": scene.transfer_simplify_location, "rotation_quaternion": scene.transfer_simplify_rotation}
+
+
+#Layout of the clip files (see ClipWriter)
+clip_magic = b"ATCLIP\0\0"
+clip_version = 1
+clip_header = struct.Struct('<8sHHIIfffI')
+clip_bone = struct.Struct('<64s64si')
+#Offset of the number of frames in the header, which is written when the clip is closed
+clip_frames_offset = 16
+#Flags of the clip header
+clip_half_location = 1
+clip_quantized_rotation = 2
+
+def clip_record_dtype(n_bones, flags):
+  """
+  :param n_bones: Number of bones of the clip
+  :param flags: Flags of the clip header
+  :return: NumPy dtype of the record of a frame, with the fields 'location' (n_bones x 3) and 'rotation' (n_bones x 4, quaternions w first)
+  """
+  location = '<f2' if flags & clip_half_location else '<f4'
+  rotation = '<i2' if flags & clip_quantized_rotation else '<f4'
+  return np.dtype([('location', location, (n_bones, 3)), ('rotation', rotation, (n_bones, 4))])
+
+class ClipWriter():
+  """
+  Writes the animation of several bones in a compact binary file, chunk by chunk, so the memory used does not depend on the length of the clip.
+  All the values are little-endian. The file has:
+   - A header (clip_header): magic, version, flags, number of bones, number of frames, fps, first frame, frames between samples and offset of the frames
+   - A table with an entry per bone (clip_bone): name, name of the origin bone and index of its relation (-1 if unknown), padded with zeros
+   - The frames, from the offset given in the header (aligned to 16 bytes), as consecutive records (see clip_record_dtype), so readers can map them in memory.
+  Locations are float16 (or float32) and rotations are quaternions quantized to int16 (value * 32767), or float32.
+  The number of frames is written when the writer is closed.
+  """
+  def __init__(self, filepath, bones, fps=24.0, frame_start=0.0, frame_step=1.0, half_location=True, quantize_rotation=True):
+    """
+    :param filepath: Path of the clip file
+    :param bones: List of tuples (name, origin_name, relation_index) with the bones of the clip
+    :param fps: Frames per second of the animation
+    :param frame_start: Frame of the first record
+    :param frame_step: Frames between two records
+    :param half_location: Whether the locations are stored as float16 instead of float32
+    :param quantize_rotation: Whether the rotations are stored as int16 instead of float32
+    :raises:
+      ValueError - If the name of a bone is longer than 64 bytes
+    """
+    self.flags = (clip_half_location if half_location else 0) | (clip_quantized_rotation if quantize_rotation else 0)
+    self.dtype = clip_record_dtype(len(bones), self.flags)
+    self.n_frames = 0
+
+    table = b""
+    for name, origin_name, relation_index in bones:
+      if len(name.encode('utf-8')) > 64 or len(origin_name.encode('utf-8')) > 64:
+        raise ValueError("Bone name longer than 64 bytes: " + name)
+      table += clip_bone.pack(name.encode('utf-8'), origin_name.encode('utf-8'), relation_index)
+    self.data_offset = -(-(clip_header.size + len(table)) // 16) * 16
+
+    self._file = open(filepath, 'wb')
+    self._file.write(clip_header.pack(clip_magic, clip_version, self.flags, len(bones), 0, fps, frame_start, frame_step, self.data_offset))
+    self._file.write(table)
+    self._file.write(b"\0" * (self.data_offset - clip_header.size - len(table)))
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+    return False
+
+  def write(self, locations, rotations):
+    """
+    Appends several frames to the clip.
+    :param locations: Array of size (frames, bones, 3)
+    :param rotations: Array of size (frames, bones, 4) with quaternions (w, x, y, z)
+    """
+    records = np.empty(len(locations), dtype=self.dtype)
+    records['location'] = locations
+    if self.flags & clip_quantized_rotation:
+      records['rotation'] = np.round(np.clip(rotations, -1.0, 1.0) * 32767)
+    else:
+      records['rotation'] = rotations
+    self._file.write(records.tobytes())
+    self.n_frames += len(records)
+
+  def close(self):
+    if self._file.closed:
+      return
+    self._file.seek(clip_frames_offset)
+    self._file.write(struct.pack('<I', self.n_frames))
+    self._file.close()
+
+class Clip():
+  """
+  Clip file (see ClipWriter) mapped in memory, so only the frames that are accessed are read.
+  """
+  def __init__(self, filepath):
+    """
+    :param filepath: Path of the clip file
+    :raises:
+      ValueError - If the file is not a clip file, or its version is not supported
+    """
+    with open(filepath, 'rb') as f:
+      header = f.read(clip_header.size)
+      if len(header) < clip_header.size or header[0:8] != clip_magic:
+        raise ValueError("Not a clip file: " + filepath)
+      magic, version, self.flags, n_bones, self.n_frames, self.fps, self.frame_start, self.frame_step, data_offset = clip_header.unpack(header)
+      if version != clip_version:
+        raise ValueError("Unsupported clip version " + str(version) + ": " + filepath)
+      table = f.read(clip_bone.size * n_bones)
+
+    #List of tuples (name, origin_name, relation_index)
+    self.bones = []
+    for i in range(n_bones):
+      name, origin_name, relation_index = clip_bone.unpack_from(table, i * clip_bone.size)
+      self.bones.append((name.rstrip(b"\0").decode('utf-8'), origin_name.rstrip(b"\0").decode('utf-8'), relation_index))
+
+    dtype = clip_record_dtype(n_bones, self.flags)
+    if self.n_frames > 0:
+      self.records = np.memmap(filepath, dtype=dtype, mode='r', offset=data_offset, shape=(self.n_frames,))
+    else:
+      self.records = np.empty(0, dtype=dtype)
+
+  def bone_names(self):
+    return [b[0] for b in self.bones]
+
+  def frames(self):
+    """
+    :return: Array with the frame of each record
+    """
+    return self.frame_start + self.frame_step * np.arange(self.n_frames)
+
+  def locations(self, frames=slice(None), bones=slice(None)):
+    """
+    :param frames: Index or slice of the records to read
+    :param bones: Index, slice or list of indices of the bones to read
+    :return: Array of size (frames, bones, 3) with the locations, as float64
+    """
+    return self.records['location'][frames][:, bones].astype(np.float64)
+
+  def rotations(self, frames=slice(None), bones=slice(None)):
+    """
+    :param frames: Index or slice of the records to read
+    :param bones: Index, slice or list of indices of the bones to read
+    :return: Array of size (frames, bones, 4) with the normalised quaternions (w, x, y, z), as float64
+    """
+    q = self.records['rotation'][frames][:, bones].astype(np.float64)
+    norm = np.linalg.norm(q, axis=-1, keepdims=True)
+    return q / np.where(norm > 0, norm, 1.0)
+
+def export_clip(scene, armature, bone_indices, frames, writer, chunk_size=256):
+  """
+  Samples several pose bones of an armature and writes them in a clip, a chunk of frames at a time.
+  :param scene: Scene that is evaluated
+  :param armature: Armature object whose pose bones are sampled
+  :param bone_indices: List with the indices of the pose bones, in the order of the bones of the clip
+  :param frames: Array with the frames to sample
+  :param writer: ClipWriter instance
+  :param chunk_size: Number of frames sampled before writing them
+  :return: Number of written frames
+  """
+  buffer = np.empty((max(1, min(chunk_size, len(frames))), len(bone_indices), 7))
+  for start in range(0, len(frames), chunk_size):
+    chunk = frames[start:start + chunk_size]
+    samples = sample_pose_bones(scene, armature, bone_indices, chunk, buffer[0:len(chunk)])
+    writer.write(samples[:, :, 0:3], samples[:, :, 3:7])
+  return len(frames)
+
+def clip_path(filepath, action_name=None):
+  """
+  :param filepath: Path of the clip file
+  :param action_name: Name of the action, when several actions are exported, which is added to the name of the file
+  :return: Path of the clip file of the action
+  """
+  if action_name is None:
+    return filepath
+  stem, ext = os.path.splitext(filepath)
+  return stem + "_" + bpy.path.clean_name(action_name) + (ext if ext else ".atclip")
+
+
+class Profiler():
+  """
+  Measures the wall time of the stages of an operation and counts the work done in them (frames evaluated, keys written...).
+  A disabled profiler records nothing, so the instrumented code does not need to check whether profiling is enabled.
+  It can also capture a cProfile of the whole operation:
+    with profiler:
+      with profiler.stage("sampling"):
+        ...
+      profiler.count("frames_evaluated", n)
+  """
+  def from_scene(scene, operation):
+    return Profiler(operation, scene.transfer_profile, scene.transfer_profile_cprofile)
+
+  def __init__(self, operation, enabled=False, use_cprofile=False):
+    self.operation = operation
+    self.enabled = enabled
+    #Accumulated time (in seconds) of each stage, and value of each counter, in the order they were first recorded
+    self.stages = {}
+    self.counters = {}
+    self.total = 0.0
+    self._start = None
+    self._profile = cProfile.Profile() if enabled and use_cprofile else None
+
+  def __enter__(self):
+    if self.enabled:
+      self._start = time.perf_counter()
+      if self._profile is not None:
+        self._profile.enable()
+    return self
+
+  def __exit__(self, *exc):
+    if self.enabled:
+      if self._profile is not None:
+        self._profile.disable()
+      self.total += time.perf_counter() - self._start
+    return False
+
+  @contextlib.contextmanager
+  def stage(self, name):
+    if not self.enabled:
+      yield
+      return
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+  def count(self, name, n=1):
+    if self.enabled:
+      self.counters[name] = self.counters.get(name, 0) + n
+
+  def to_dict(self, top=30):
+    """
+    :param top: Number of functions of the cProfile capture that are included, sorted by cumulative time
+    :return: Dictionary with the operation, the total time, the time of each stage, the counters and the cProfile capture (as text)
+    """
+    report = {"operation": self.operation, "total": self.total, "stages": dict(self.stages), "counters": dict(self.counters)}
+    if self._profile is not None:
+      stream = io.StringIO()
+      pstats.Stats(self._profile, stream=stream).sort_stats('cumulative').print_stats(top)
+      report["cprofile"] = stream.getvalue()
+    return report
+
+  def emit(self, operator, filepath=""):
+    """
+    Writes the JSON report of the profiler in a file, or prints it in the console if no file is given.
+    :param operator: Operator whose report method is used to notify the total time
+    :param filepath: Path of the JSON file. Empty to print the report.
+    """
+    if not self.enabled:
+      return
+    report = json.dumps(self.to_dict(), indent=2)
+    if filepath:
+      with open(bpy.path.abspath(filepath), 'w') as f:
+        f.write(report)
+    else:
+      print(report)
+    operator.report({'INFO'}, self.operation + " took " + "{:.3f}".format(self.total) + " s")
 
 
 class Relation():
   def __init__(self, origin, target, offset):
-    self.__origin = re.compile('(.*)' + origin + '$')
-    self.__target = re.compile('(.*)' + target + '$')
+    self.__origin_name = origin
+    self.__target_name = target
+    #The regular expressions are only compiled if needed, since bones are usually matched with a SuffixIndex
+    self.__origin = None
+    self.__target = None
     self.__offset = offset
 
   def get_origin(self):
+    if self.__origin is None:
+      self.__origin = re.compile('(.*)' + self.__origin_name + '$')
     return self.__origin
 
   def get_target(self):
+    if self.__target is None:
+      self.__target = re.compile('(.*)' + self.__target_name + '$')
     return self.__target
 
+  def get_origin_name(self):
+    return self.__origin_name
+
+  def get_target_name(self):
+    return self.__target_name
+
+  def has_offset(self):
+    return self.__offset is not None
+
   def get_offset(self):
     if self.__offset is None:
       return Transformation.Identity()
@@ -188,6 +1649,55 @@ class Relation():
       return self.__offset
 
 
+class SuffixIndex():
+  """
+  Finds which names of a list are a suffix of a given bone name, walking a trie built with the reversed names.
+  Names that contain regular expression symbols can't be looked up literally, so they are matched with their regular expression instead.
+  """
+  special_characters = set('.^$*+?{}[]|()\\')
+
+  def __init__(self, names):
+    self._root = {}
+    self._patterns = []
+    for k, name in enumerate(names):
+      if any(c in SuffixIndex.special_characters for c in name):
+        self._patterns.append((k, re.compile('(.*)' + name + '$')))
+        continue
+      node = self._root
+      for c in reversed(name):
+        node = node.setdefault(c, {})
+      node.setdefault(None, []).append(k)
+
+  def lookup(self, name):
+    """
+    Finds the names that are a suffix of the given name.
+    :param name: Name of the bone
+    :return: List with the indices of the names that are a suffix of the given name
+    """
+    found = list(self._root.get(None, []))
+    node = self._root
+    for c in reversed(name):
+      node = node.get(c)
+      if node is None:
+        break
+      found.extend(node.get(None, []))
+    found.extend(k for k, pattern in self._patterns if pattern.match(name))
+    return found
+
+def match_bones(names, bones):
+  """
+  Finds, for each name, the bones whose name ends with it.
+  :param names: List with the names (or the ends of the names) to search
+  :param bones: List with the names of the bones
+  :return: List with, for each name, the sorted list of the indices of the bones that end with such name
+  """
+  index = SuffixIndex(names)
+  hits = [[] for _ in names]
+  for i, b in enumerate(bones):
+    for k in index.lookup(b):
+      hits[k].append(i)
+  return hits
+
 
 def find_armature(obj):
   """
@@ -241,10 +1751,135 @@ class Warning():
   def __init__(self, msg):
     self.msg = msg
 
+def legacy_relations():
+  """
+  Builds the relations between bones with the same name in the u3d skeleton format (see bone_names and finger_names).
+  :return: List of Relation instances, shared by all the callers
+  """
+  if BaseAnimationTransfer.regular_expressions == []:
+    for b in bone_names:
+      BaseAnimationTransfer.regular_expressions.append(Relation(b, b, None))
+    for f in finger_names:
+      for p in finger_part_names:
+        BaseAnimationTransfer.regular_expressions.append(Relation(f + p, f + p, None))
+  return BaseAnimationTransfer.regular_expressions
+
+def id_exists(block, collection):
+  """
+  :param block: Data block (object, action...) that may have been removed from the file
+  :param collection: Collection of bpy.data that keeps the blocks of its type
+  :return: Whether the block is still in the collection
+  """
+  try:
+    return collection.get(block.name) == block
+  except ReferenceError:
+    return False
+
+class TransferUndo():
+  """
+  Records the changes that a transfer makes to the target armature, so a transfer that is run in steps and cancelled
+  leaves the armature as it was: the new actions are removed, the modified ones are restored from a copy, and the offsets
+  applied to the rest pose are reverted, connecting again the bones that they disconnected. The previous animation of the
+  armature is only cleared once the transfer is applied.
+  """
+  def __init__(self, target_object):
+    self.target_object = target_object
+    self.offsets = applied_offsets(target_object)
+    self.connected = {bone.name: bone.use_connect for bone in target_object.data.bones}
+    animation_data = target_object.animation_data
+    self.had_animation_data = animation_data is not None
+    self.action = animation_data.action if animation_data is not None else None
+    self.use_nla = animation_data.use_nla if animation_data is not None else True
+    self.drivers = [(fcurve, fcurve.mute) for fcurve in animation_data.drivers] if animation_data is not None else []
+    self.clear = False
+    self.created = []
+    #Dictionary {action name: (action, copy)} with the actions modified by the transfer
+    self.backups = {}
+
+  def clear_animation(self):
+    """
+    Replaces animation_data_clear until the transfer is applied: the NLA tracks and drivers of the armature are muted instead.
+    """
+    self.clear = True
+    animation_data = self.target_object.animation_data
+    if animation_data is not None:
+      animation_data.use_nla = False
+      for fcurve, _ in self.drivers:
+        fcurve.mute = True
+
+  def new_action(self, action):
+    self.created.append(action)
+
+  def edit_action(self, action):
+    """
+    Keeps a copy of an existing action before the transfer modifies it.
+    """
+    if action.name not in self.backups:
+      self.backups[action.name] = (action, action.copy())
+
+  def apply(self):
+    """
+    Keeps the changes of the transfer, clearing the previous animation of the armature if it was replaced.
+    """
+    for _, backup in self.backups.values():
+      bpy.data.actions.remove(backup)
+    if self.clear:
+      animation_data = self.target_object.animation_data
+      action = animation_data.action if animation_data is not None else None
+      self.target_object.animation_data_clear()
+      if action is not None:
+        self.target_object.animation_data_create().action = action
+
+  def restore(self):
+    """
+    Undoes the changes of the transfer.
+    """
+    previous = self.action
+    for name, (action, backup) in self.backups.items():
+      if not id_exists(backup, bpy.data.actions):
+        continue
+      if previous == action:
+        previous = backup
+      if id_exists(action, bpy.data.actions):
+        bpy.data.actions.remove(action)
+      backup.name = name
+    for action in self.created:
+      if id_exists(action, bpy.data.actions):
+        bpy.data.actions.remove(action)
+
+    #Nothing else can be restored if the armature was removed meanwhile
+    if not id_exists(self.target_object, bpy.data.objects):
+      return
+    if not self.had_animation_data:
+      self.target_object.animation_data_clear()
+    elif self.target_object.animation_data is not None:
+      animation_data = self.target_object.animation_data
+      animation_data.action = previous
+      animation_data.use_nla = self.use_nla
+      for fcurve, mute in self.drivers:
+        fcurve.mute = mute
+
+    changes = offset_changes(applied_offsets(self.target_object), self.offsets)
+    if len(changes) > 0:
+      apply_offsets(self.target_object, changes)
+      self.target_object.data[offsets_property] = json.dumps({name: m.ravel().tolist() for name, m in self.offsets.items()})
+    #The bones are connected again once they are back in their previous rest pose
+    connected = connect_bones(self.target_object, self.connected)
+    if len(changes) > 0 or connected > 0:
+      bpy.context.view_layer.update()
+
 # -----------------------------------------
 class BaseAnimationTransfer():
 
   regular_expressions = []
+  #Disabled by default, the operators replace it when profiling is enabled
+  _profiler = Profiler("transfer")
+  #Runs the NumPy work of the transfer (see pack_planned_channels). The modal operators replace it with a worker thread.
+  _executor = InlineExecutor()
+  #TransferUndo instance of the transfers that can be cancelled, or None to change the armatures right away
+  _undo = None
+  #OriginTracks instance shared by the transfers of an origin armature to several targets, or None to sample each transfer
+  _origin_tracks = None
 
   def __init__(self, expr = []):
       self._relations = expr
@@ -257,29 +1892,43 @@ class BaseAnimationTransfer():
     :param target_bones: List of the names of the bones in the target object
     :return: List of indices tuples (t,i,j) where: relations[t].get_origin() matches origin_bones[i] and relations[t].get_target() matches target_bones[j]
     """
+    origin_hits = match_bones([r.get_origin_name() for r in relations], origin_bones)
+    target_hits = match_bones([r.get_target_name() for r in relations], target_bones)
+
     matches = []
-    for t, r in enumerate(relations):
-      for i, b in enumerate(origin_bones):
-        if r.get_origin().match(b):
-          for j, b in enumerate(target_bones):
-            if r.get_target().match(b):
-              matches.append((t, i, j))
+    for t in range(len(relations)):
+      for i in origin_hits[t]:
+        for j in target_hits[t]:
+          matches.append((t, i, j))
     return matches
 
-  def transfer(self, context):
+  def transfer(self, context, options=None):
+    if options is None:
+      options = TransferOptions.from_scene(context.scene)
+
+    armatures = self.selected_armatures()
+    if armatures is None:
+      return {'CANCELLED'}
+    return self.transfer_objects(armatures[0], armatures[1], options)
+
+  def selected_armatures(self):
+    """
+    Finds the origin and target armatures from the selected objects, reporting why they can't be found.
+    :return: Tuple (origin_object, target_object), or None if they could not be found
+    """
     if len(bpy.context.selected_objects) != 2:
       self.report({'ERROR'}, "Select two different objects (first origin and then target objects).")
-      return {'CANCELLED'}
+      return None
 
     if bpy.context.active_object is None:
       self.report({'ERROR'}, "Could not retrieve target object.")
-      return {'CANCELLED'}
+      return None
 
     origin_container = get_origin_object(bpy.context.active_object, bpy.context.selected_objects)
 
     if origin_container is None:
       self.report({'ERROR'}, "Could not retrieve origin object.")
-      return {'CANCELLED'}
+      return None
 
     #Find the armatures from the selected objects
     ret_o, origin_object = find_armature(origin_container)
@@ -287,69 +1936,694 @@ class BaseAnimationTransfer():
 
     if not ret_o:
       self.report({'ERROR'}, "Origin object " + bpy.context.selected_objects[1].name + " does not have an armature")
-      return {'CANCELLED'}
+      return None
     if not ret_t:
       self.report({'ERROR'}, "Target object " + bpy.context.active_object.name + " does not have an armature")
-      return {'CANCELLED'}
+      return None
     if origin_object == target_object:
       self.report({'ERROR'}, "Select two different objects (first origin and then target objects).")
+      return None
+
+    return origin_object, target_object
+
+  def notify(self, title, message):
+    ShowMessage('INFO', title, message)
+
+  def transfer_objects(self, origin_object, target_object, options):
+    """
+    Transfers the animation between two armatures, without depending on the selection.
+    :param origin_object: Armature object with the animation
+    :param target_object: Armature object to which the animation is transferred
+    :param options: TransferOptions instance
+    :return: {'FINISHED'} if the animation was transferred, {'CANCELLED'} otherwise
+    """
+    return run_steps(self.transfer_steps(origin_object, target_object, options))
+
+  def transfer_to_targets(self, origin_object, targets, options):
+    """
+    Transfers the animation of an armature to several target armatures, each one with its own relations.
+    The origin armature is sampled once for all the targets (see OriginTracks), and each target is matched and written
+    from the same samples. Transfers that insert the keyframes one by one still evaluate the origin for each target.
+    :param origin_object: Armature object with the animation
+    :param targets: List of tuples (target_object, relations), where relations is a list of Relation instances, or None to use the relations of the transfer
+    :param options: TransferOptions instance
+    :return: List with the result of each target ({'FINISHED'} or {'CANCELLED'}), in the same order
+    """
+    relations = self._relations
+    self._origin_tracks = OriginTracks(options.sample_window)
+    results = []
+    try:
+      #The shared samples of the origin are taken with the first target, so the meshes of all the targets are kept out of the evaluation
+      with sampling_scope([origin_object] + [target_object for target_object, _ in targets]):
+        for target_object, target_relations in targets:
+          self._relations = relations if target_relations is None else target_relations
+          results.append(self.transfer_objects(origin_object, target_object, options))
+    finally:
+      self._relations = relations
+      self._origin_tracks = None
+    return results
+
+  def transfer_steps(self, origin_object, target_object, options):
+    """
+    Transfers the animation as transfer_objects does, in short steps, so the interface can keep working between them.
+    Closing the generator stops the transfer, leaving the origin armature and the scene as they were.
+    :return: Generator that yields the fraction of the transfer that is done after each step, and returns {'FINISHED'}
+      if the animation was transferred or {'CANCELLED'} otherwise
+    """
+    error = options.frame_range_error()
+    if error is not None:
+      self.report({'ERROR'}, error)
       return {'CANCELLED'}
 
+    self._bones = BoneCache()
+
     #Match the names of the armatures with the regular expressions
-    matches = self.get_matches(self._relations, origin_object.data.bones.keys(), target_object.data.bones.keys())
+    with self._profiler.stage("matching"):
+      matches = self.get_matches(self._relations, origin_object.data.bones.keys(), target_object.data.bones.keys())
     n = len(matches)
+    self._profiler.count("matches", n)
     if n > 0:  
-      ShowMessage('INFO', 'Matches', "Found " + str(len(matches)) + " matches between armatures.")
+      self.notify('Matches', "Found " + str(len(matches)) + " matches between armatures.")
       self.report({'INFO'}, "Found " + str(len(matches)) + " matches between armatures.")
     else:
       self.report({'WARNING'}, "Found no matches between armatures!")
 
-    #Get the animation
-    animation = origin_object.animation_data.action
-    if animation == None:
-      self.report({'ERROR'}, "Origin object " + origin_object.name + " does not have an animation")
+    #Get the animations
+    actions = origin_actions(origin_object, options.actions)
+    single = options.actions == 'ACTIVE'
+    if not isinstance(options.actions, str):
+      for name in options.actions:
+        if name not in bpy.data.actions:
+          self.report({'WARNING'}, "Could not find the action " + name)
+    if len(actions) == 0:
+      if single:
+        self.report({'ERROR'}, "Origin object " + origin_object.name + " does not have an animation")
+      else:
+        self.report({'ERROR'}, "Found no actions to transfer from " + origin_object.name)
+      return {'CANCELLED'}
+    if origin_object.animation_data is None:
+      origin_object.animation_data_create()
+    animation_data = origin_object.animation_data
+    if not single and animation_data.use_tweak_mode:
+      self.report({'ERROR'}, "Exit the NLA tweak mode of " + origin_object.name + " to transfer several actions")
       return {'CANCELLED'}
 
+    #Incremental transfers rewrite the previous actions, so the bones that did not change keep their animation
+    incremental = options.incremental and (options.bulk_write or options.curve_copy or options.channel_offsets)
+    if options.incremental and not incremental:
+      self.report({'WARNING'}, "Incremental transfers need bulk writing. The whole animation is transferred.")
+
     #Clear original animation
-    target_object.animation_data_clear()
+    if not incremental:
+      if self._undo is not None:
+        self._undo.clear_animation()
+      else:
+        target_object.animation_data_clear()
     origin_object.data.pose_position='REST'
     target_object.data.pose_position='REST'
 
     origin_object.select_set(False)
 
     selected_frame = bpy.context.scene.frame_current
-    last_frame = ceil(animation.frame_range[1]) + 1
-    frames = np.arange(last_frame)
 
-    #Apply the translations and rotations to all the matching bones in the target armature, for all the keyframes in the animation
-    for r_idx, o_idx, t_idx in matches:
-          
-      target_bone = get_pose_bone(target_object, t_idx)
-      origin_bone = get_pose_bone(origin_object, o_idx)
-      offset = self._relations[r_idx].get_offset()
-      
-      offset.apply(target_object, target_bone.name)
-      bpy.context.view_layer.update()
+    #Apply the offsets of the relations to the rest pose of all the matching bones in the target armature
+    #(unless they are applied to the animation channels instead)
+    if not options.channel_offsets:
+      self.apply_match_offsets(target_object, matches, incremental)
 
     origin_object.data.pose_position='POSE'
     target_object.data.pose_position='POSE'
 
+    #The matches and offsets are shared by all the actions, each of which is written on its own new action
+    active_action, use_nla = animation_data.action, animation_data.use_nla
+    transferred = []
+    #Only the pose bones are read, so the objects parented to the armatures are not evaluated meanwhile
+    with sampling_scope([origin_object, target_object]):
+      try:
+        if not single:
+          #Only the action being transferred is evaluated, without the NLA strips on top
+          animation_data.use_nla = False
+        for a, action in enumerate(actions):
+          if single:
+            name = target_object.name + "Action"
+          else:
+            animation_data.action = action
+            reset_pose(origin_object)
+            name = target_object.name + "_" + action.name
+          if incremental and name in bpy.data.actions:
+            target_action = bpy.data.actions[name]
+            if self._undo is not None:
+              self._undo.edit_action(target_action)
+            if target_object.animation_data is None:
+              target_object.animation_data_create()
+            target_object.animation_data.action = target_action
+          else:
+            target_action = create_action(target_object, name)
+            if self._undo is not None:
+              self._undo.new_action(target_action)
+          frame_range = FrameRange.from_action(action, options)
+
+          if incremental:
+            steps = self.bake_incremental(origin_object, target_object, target_action, matches, frame_range, options)
+          elif options.bulk_write or options.curve_copy or options.channel_offsets:
+            steps = self.bake(origin_object, target_object, target_action, matches, frame_range, options)
+          else:
+            steps = self.insert_keyframes(origin_object, target_object, target_action, matches, frame_range, options)
+          for progress in steps:
+            yield (a + progress) / len(actions)
+          transferred.append(target_action)
+          self._profiler.count("actions")
+
+          if options.export_clip is not None:
+            filepath = clip_path(options.export_clip, None if single else action.name)
+            with self._profiler.stage("clip_export"):
+              n = self.export_clip(origin_object.data.bones.keys(), target_object, matches, frame_range, filepath, options)
+            self._profiler.count("clip_frames", n)
+      finally:
+        animation_data.action = active_action
+        animation_data.use_nla = use_nla
+        bpy.context.scene.frame_set(selected_frame)
+
+    if not single:
+      #Keep every new action when the file is saved, leaving active the one of the active origin action
+      for target_action in transferred:
+        target_action.use_fake_user = True
+      active = actions.index(active_action) if active_action in actions else 0
+      target_object.animation_data.action = transferred[active]
+      self.report({'INFO'}, "Transferred " + str(len(transferred)) + " actions to " + target_object.name)
+
+    return {'FINISHED'}
+
+  def apply_match_offsets(self, target_object, matches, incremental=False):
+    """
+    Applies the offsets of the relations to the rest pose of the matched bones of the target armature.
+    The offsets applied to each bone are kept in a custom property of the armature (offsets_property), so incremental
+    transfers only apply the difference between them and the new offsets.
+    :param target_object: Armature object to which the animation is transferred
+    :param matches: List of indices tuples (t,i,j) as returned by get_matches
+    :param incremental: Whether the offsets replace the ones already applied, instead of being applied on top of them
+    """
+    with self._profiler.stage("offsets"):
+      offsets = [(self._bones.pose_bone(target_object, t_idx).name, self._relations[r_idx].get_offset()) for r_idx, _, t_idx in matches]
+
+      identity = np.identity(4)
+      applied = applied_offsets(target_object)
+      composed = dict(applied) if not incremental else {}
+      for name, offset in offsets:
+        if not offset.is_identity():
+          composed[name] = composed.get(name, identity) @ np.array(offset.build_matrix())
+      if incremental:
+        offsets = offset_changes(applied, composed)
+
+      changed = apply_offsets(target_object, offsets)
+      if changed > 0 or len(applied) > 0:
+        target_object.data[offsets_property] = json.dumps({name: m.ravel().tolist() for name, m in composed.items() if not np.allclose(m, identity)})
+      if changed > 0:
+        #Edit mode is entered and left once
+        self._profiler.count("mode_switches", 2)
+        self._profiler.count("offset_bones", changed)
+        self._bones.invalidate(target_object)
+        bpy.context.view_layer.update()
+
+  def transfer_clip(self, clip, target_object, options):
+    """
+    Transfers the animation of a clip file (see Clip) to an armature, without loading nor evaluating any origin armature.
+    The bones of the clip are matched with the relations as the bones of an origin armature would, and the tracks of the
+    matched bones are written directly on a new action of the target armature.
+    If options.frame_range is set, only the frames of the clip within it are transferred, and options.frame_step (rounded to
+    a multiple of the frame step of the clip) skips frames of the clip.
+    :param clip: Clip instance with the origin animation
+    :param target_object: Armature object to which the animation is transferred
+    :param options: TransferOptions instance
+    :return: {'FINISHED'} if the animation was transferred, {'CANCELLED'} otherwise
+    """
+    error = options.frame_range_error()
+    if error is not None:
+      self.report({'ERROR'}, error)
+      return {'CANCELLED'}
+
+    self._bones = BoneCache()
+
+    with self._profiler.stage("matching"):
+      matches = self.get_matches(self._relations, clip.bone_names(), target_object.data.bones.keys())
+    self._profiler.count("matches", len(matches))
+    if len(matches) > 0:
+      self.report({'INFO'}, "Found " + str(len(matches)) + " matches between the clip and the armature.")
+    else:
+      self.report({'WARNING'}, "Found no matches between the clip and the armature!")
+
+    #Records of the clip that are transferred
+    frames = clip.frames()
+    selected = np.arange(clip.n_frames)
+    if options.frame_range is not None:
+      selected = selected[(frames >= options.frame_range[0]) & (frames <= options.frame_range[1])]
+    step = options.frame_step
+    stride = 1
+    if clip.frame_step > 0:
+      stride = max(1, int(round(options.frame_step / clip.frame_step)))
+      selected = selected[::stride]
+      #The frames are written (and exported) with the step that was actually used
+      step = stride * clip.frame_step
+    if len(selected) == 0:
+      self.report({'ERROR'}, "The clip has no frames to transfer")
+      return {'CANCELLED'}
+    frames = frames[selected]
+    frame_range = FrameRange(frames[0], frames[-1], step, options.time_scale)
+
+    #Only the active action of the target is replaced, keeping its NLA tracks and drivers
+    target_object.data.pose_position='REST'
+    if not options.channel_offsets:
+      self.apply_match_offsets(target_object, matches)
+    target_object.data.pose_position='POSE'
+
+    action = create_action(target_object, target_object.name + "Action")
+
+    #Every clip bone is read once, even if it drives several target bones, and its track is written before reading the next
+    #one, in windows of records that are read from the mapped file
+    groups = defaultdict(list)
+    for match in matches:
+      groups[match[1]].append(match)
+    windows = [selected[i:i + options.sample_window] for i in range(0, len(selected), max(1, options.sample_window))]
+    windows = [(i * max(1, options.sample_window), slice(w[0], w[-1] + 1, stride)) for i, w in enumerate(windows)]
+    track = np.empty((len(selected), 7))
+    output_frames = frame_range.output_frames(frames)
+
+    written = 0
+    for o_idx, group in groups.items():
+      with self._profiler.stage("sampling"):
+        for start, records in windows:
+          locations = clip.locations(records, o_idx)
+          track[start:start + len(locations), 0:3] = locations
+          track[start:start + len(locations), 3:7] = clip.rotations(records, o_idx)
+      with self._profiler.stage("writing"):
+        for r_idx, _, t_idx in group:
+          target_name = self._bones.pose_bone(target_object, t_idx).name
+          channels = track
+          offset = self._relations[r_idx].get_offset()
+          if options.channel_offsets and not offset.is_identity():
+            channels = transform_channels(channels, np.array(offset.get_rotation()), np.array(offset.get_translation()))
+          written += write_bone_channel(action, target_name, "location", output_frames, channels[:, 0:3], options.tolerance("location"))
+          written += write_bone_channel(action, target_name, "rotation_quaternion", output_frames, channels[:, 3:7], options.tolerance("rotation_quaternion"))
+    self._profiler.count("frames_read", len(selected))
+    self._profiler.count("keys_written", written)
+
+    if options.export_clip is not None:
+      with self._profiler.stage("clip_export"), sampling_scope([target_object]):
+        n = self.export_clip(clip.bone_names(), target_object, matches, frame_range, options.export_clip, options)
+      self._profiler.count("clip_frames", n)
+
+    return {'FINISHED'}
+
+  def export_clip(self, origin_names, target_object, matches, frame_range, filepath, options):
+    """
+    Samples the transferred animation of the matched target bones and exports it as a clip file (see ClipWriter).
+    Each bone of the clip keeps the name of the origin bone and the index of the relation of its first match.
+    :param origin_names: List with the names of the origin bones, as indexed by the matches
+    :param target_object: Armature object with the transferred animation
+    :param matches: List of indices tuples (t,i,j) as returned by get_matches
+    :param frame_range: FrameRange instance whose output frames are sampled
+    :param filepath: Path of the clip file
+    :param options: TransferOptions instance
+    :return: Number of exported frames
+    """
+    bones = {}
+    for r_idx, o_idx, t_idx in matches:
+      if t_idx not in bones:
+        bones[t_idx] = (self._bones.pose_bone(target_object, t_idx).name, origin_names[o_idx], r_idx)
+
+    scene = bpy.context.scene
+    frames = frame_range.output_frames()
+    step = frame_range.step * frame_range.time_scale
+    with ClipWriter(filepath, list(bones.values()), scene.render.fps / scene.render.fps_base, frames[0] if len(frames) > 0 else frame_range.start,
+                    step, options.clip_half_location, options.clip_quantize_rotation) as writer:
+      return export_clip(scene, target_object, list(bones.keys()), frames, writer)
+
+  def insert_keyframes(self, origin_object, target_object, action, matches, frame_range, options):
+    """
+    Copies the pose of the matched bones frame by frame, inserting the keyframes one by one in the active action of the target armature.
+    :param origin_object: Armature object with the animation
+    :param target_object: Armature object to which the animation is transferred
+    :param action: Active action of the target armature
+    :param matches: List of indices tuples (t,i,j) as returned by get_matches
+    :param frame_range: FrameRange instance with the frames to sample
+    :param options: TransferOptions instance
+    :return: Generator that yields the fraction of the action that is written after each step
+    """
+    pairs = [(self._bones.pose_bone(origin_object, o_idx), self._bones.pose_bone(target_object, t_idx)) for _, o_idx, t_idx in matches]
+    frames = frame_range.sample_frames()
+
+    #Sampling and writing are interleaved, so they are measured as a single stage
+    with self._profiler.stage("sampling_and_writing"):
+      for f, (frame, output_frame) in enumerate(zip(frames, frame_range.output_frames())):
+        if f > 0 and f % transfer_step_frames == 0:
+          yield f / len(frames)
+        set_frame(bpy.context.scene, frame)
+
+        for origin_bone, target_bone in pairs:
+          target_bone.location = origin_bone.location
+          target_bone.rotation_quaternion = origin_bone.rotation_quaternion
+
+          target_bone.keyframe_insert("location", frame=output_frame)
+          target_bone.keyframe_insert("rotation_quaternion", frame=output_frame)
+    self._profiler.count("frames_evaluated", len(frames))
+    self._profiler.count("keys_written", 7 * len(frames) * len(pairs))
+
+    if options.simplify is not None:
+      with self._profiler.stage("simplify"):
+        for channel, tolerance in options.simplify.items():
+          fcurves = [fc for fc in action.fcurves if fc.data_path.endswith('.' + channel)]
+          simplify_fcurves(fcurves, tolerance)
+
+  def bake_incremental(self, origin_object, target_object, action, matches, frame_range, options):
+    """
+    Bakes the animation as bake does, but only rewrites the target bones whose origin F-Curves or relations changed since
+    the previous incremental transfer to the same action, and only over the frames that changed.
+    The frames are split in buckets of transfer_bucket_size samples, and the action keeps (in record_property) a fingerprint
+    of the relations of each target bone and (in buckets_property) a hash of the origin keyframes that affect each bucket (see bucket_hashes).
+    Driven origin bones (see driven_bones) are always rewritten, since their animation does not depend on their F-Curves only.
+    :param origin_object: Armature object with the animation
+    :param target_object: Armature object to which the animation is transferred
+    :param action: Action of the target armature, with the result of a previous transfer or empty
+    :param matches: List of indices tuples (t,i,j) as returned by get_matches
+    :param frame_range: FrameRange instance with the frames to sample
+    :param options: TransferOptions instance
+    :return: Generator that yields the fraction of the action that is written after each step
+    """
+    frames = frame_range.sample_frames()
+    n = len(frames)
+    buckets = [(frames[i], frames[min(i + transfer_bucket_size, n) - 1]) for i in range(0, n, transfer_bucket_size)]
+    settings = hashlib.blake2b(repr((frame_range.start, frame_range.end, frame_range.step, frame_range.time_scale, options.channel_offsets,
+                                     options.curve_copy, sorted((options.simplify or {}).items()), transfer_bucket_size)).encode('utf-8'),
+                               digest_size=16).hexdigest()
+    record = json.loads(action.get(record_property, "{}"))
+    previous = {}
+    if record.get("version") == 2 and record.get("settings") == settings:
+      previous = record["bones"]
+      previous_buckets = np.frombuffer(bytes(action.get(buckets_property, b"")), dtype='<u8')
+
+    curves = bone_fcurves(origin_object.animation_data.action)
+    driven = driven_bones(origin_object)
+    origin_hashes = {}
+
+    #Matches of each target bone, which are rewritten together since the last one overrides the others
+    groups = defaultdict(list)
+    for match in matches:
+      groups[match[2]].append(match)
+
+    writes = dict(zip(matches, self.plan_matches(origin_object, target_object, matches, options)))
+
+    bones = {}
+    digests = []
+    dirty = []
+    with self._profiler.stage("fingerprints"):
+      for t_idx, group in groups.items():
+        target_name = self._bones.pose_bone(target_object, t_idx).name
+        relation = hashlib.blake2b(digest_size=16)
+        hashes = []
+        full = False
+        for match in group:
+          r_idx, o_idx, _ = match
+          origin_name = self._bones.pose_bone(origin_object, o_idx).name
+          r = self._relations[r_idx]
+          relation.update(repr((r.get_origin_name(), r.get_target_name(), origin_name, sorted(writes[match].items()),
+                                np.round(np.array(r.get_offset().build_matrix()), 6).tolist())).encode('utf-8'))
+          if o_idx not in origin_hashes:
+            origin_hashes[o_idx] = bucket_hashes(curves.get(origin_name, {}), buckets)
+          hashes.append(origin_hashes[o_idx])
+          full = full or origin_name in driven
+        if len(hashes) > 1:
+          hashes = np.stack(hashes, axis=1)
+          hashes = np.frombuffer(b"".join(hashlib.blake2b(h.tobytes(), digest_size=8).digest() for h in hashes), dtype='<u8')
+        else:
+          hashes = hashes[0]
+        bones[target_name] = {"relation": relation.hexdigest(), "row": len(digests)}
+        digests.append(hashes)
+
+        old = previous.get(target_name)
+        if old is not None:
+          old_hashes = previous_buckets[old["row"] * len(buckets):(old["row"] + 1) * len(buckets)]
+        if full or old is None or old["relation"] != bones[target_name]["relation"] or len(old_hashes) != len(hashes):
+          spans = [(0, n)]
+          #The channels that are no longer written lose their animation
+          written_channels = set(channel for match in group for channel in writes[match])
+          remove_bone_fcurves(action, target_name, [channel for channel in bone_channels if channel not in written_channels])
+        else:
+          spans = dirty_spans(old_hashes != hashes, transfer_bucket_size, n)
+        group = [match for match in group if len(writes[match]) > 0]
+        if len(spans) > 0 and len(group) > 0:
+          dirty.append((group, spans))
+
+    #The bones that are no longer matched lose their animation
+    for name in set(previous) - set(bones):
+      remove_bone_fcurves(action, name, bone_channels)
+
+    if options.curve_copy and len(dirty) > 0:
+      with self._profiler.stage("curve_copy"):
+        remaining = set(self.copy_curves(origin_object, target_object, action, [m for group, _ in dirty for m in group], frame_range, options))
+      dirty = [([m for m in group if m in remaining], spans) for group, spans in dirty]
+      dirty = [(group, spans) for group, spans in dirty if len(group) > 0]
+
+    self._profiler.count("dirty_bones", len(dirty))
+    self.report({'INFO'}, "Rewriting " + str(len(dirty)) + " of " + str(len(groups)) + " bones in " + action.name)
+
+    if len(dirty) > 0:
+      #Only the frames of the dirty spans are sampled, once for all the bones
+      needed = np.zeros(n, dtype=bool)
+      for _, spans in dirty:
+        for first, end in spans:
+          needed[first:end] = True
+      rows = np.full(n, -1)
+      rows[needed] = np.arange(np.count_nonzero(needed))
+
+      origin_indices, layout = self.plan_sampling(origin_object, [m for group, _ in dirty for m in group], writes, options)
+      columns = {o_idx: c for c, o_idx in enumerate(origin_indices)}
+      samples, window = track_buffer((np.count_nonzero(needed), len(origin_indices), sum(bone_channels[c] for c in layout)), options.sample_window)
+      with self._profiler.stage("sampling"):
+        for progress in self.sample_origin(origin_object, origin_indices, frames, needed, samples, list(layout), window):
+          yield 0.5 * progress
+      output_frames = frame_range.output_frames(frames)
+
+      with self._profiler.stage("writing"):
+        written = 0
+        for g, (group, spans) in enumerate(dirty):
+          if g > 0:
+            yield 0.5 + 0.5 * g / len(dirty)
+          for match in group:
+            r_idx, o_idx, t_idx = match
+            target_name = self._bones.pose_bone(target_object, t_idx).name
+            origin_mode = self._bones.pose_bone(origin_object, o_idx).rotation_mode
+            rotation, translation = self.channel_offset(r_idx, options)
+            for s, (first, end) in enumerate(spans):
+              values = planned_values(np.asarray(samples[rows[first:end], columns[o_idx]], dtype=np.float64), layout, writes[match], origin_mode, rotation, translation)
+              for channel, status in writes[match].items():
+                if status == 'ANIMATED':
+                  written += splice_bone_channel(action, target_name, channel, output_frames[first:end], values[channel], options.tolerance(channel))
+                elif s == 0:
+                  #Constant channels keep a single keyframe, with the same value in every span
+                  written += write_bone_channel(action, target_name, channel, output_frames[0:1], values[channel][0:1])
+      self._profiler.count("keys_written", written)
+
+    action[record_property] = json.dumps({"version": 2, "settings": settings, "bones": bones})
+    action[buckets_property] = b"".join(h.astype('<u8').tobytes() for h in digests)
+
+  def bake(self, origin_object, target_object, action, matches, frame_range, options):
+    """
+    Samples the matched origin bones in a single pass over the frames and writes the result on an action of the
+    target armature, creating each F-Curve in a single operation instead of inserting the keyframes one by one.
+    If options.curve_copy is set, the F-Curves of the origin bones are copied instead whenever it is possible.
+    If options.channel_offsets is set, the offsets of the relations are applied to the sampled channels (see transform_channels).
+    :param origin_object: Armature object with the animation
+    :param target_object: Armature object to which the animation is transferred
+    :param action: New action of the target armature in which the animation is written
+    :param matches: List of indices tuples (t,i,j) as returned by get_matches
+    :param frame_range: FrameRange instance with the frames to sample
+    :param options: TransferOptions instance
+    :return: Generator that yields the fraction of the action that is written after each step
+    """
+    if options.curve_copy:
+      with self._profiler.stage("curve_copy"):
+        matches = self.copy_curves(origin_object, target_object, action, matches, frame_range, options)
+      if len(matches) == 0:
+        return
+
+    #Only the channels that the origin action animates are sampled and written
+    writes = self.plan_matches(origin_object, target_object, matches, options)
+    writes = [(match, w) for match, w in zip(matches, writes) if len(w) > 0]
+    self._profiler.count("channels_written", sum(len(w) for _, w in writes))
+    if len(writes) == 0:
+      return
+
+    #Every origin bone is sampled once, even if it drives several target bones
+    origin_indices, layout = self.plan_sampling(origin_object, [match for match, _ in writes], dict(writes), options)
+    columns = {o_idx: c for c, o_idx in enumerate(origin_indices)}
+    sample_frames = frame_range.sample_frames()
+    rows = slice(None)
+    if not any('ANIMATED' in w.values() for _, w in writes):
+      #Constant channels only need the value of one frame
+      rows = slice(0, 1)
+    samples, window = track_buffer((len(sample_frames[rows]), len(origin_indices), sum(bone_channels[c] for c in layout)), options.sample_window)
+    with self._profiler.stage("sampling"):
+      for progress in self.sample_origin(origin_object, origin_indices, sample_frames, rows, samples, list(layout), window):
+        yield 0.5 * progress
+    frames = frame_range.output_frames(sample_frames[rows])
+
+    #The offsets and the simplification are computed by the executor, while the F-Curves are written as their keyframes are ready
+    tolerances = {channel: options.tolerance(channel) for channel in bone_channels}
+    def submit(match, w):
+      r_idx, o_idx, _ = match
+      rotation, translation = self.channel_offset(r_idx, options)
+      #Mapped samples are 32 bit, the offsets are computed with 64 bit floats either way
+      return self._executor.submit(pack_planned_channels, frames, np.asarray(samples[:, columns[o_idx]], dtype=np.float64), layout, w,
+                                   self._bones.pose_bone(origin_object, o_idx).rotation_mode, rotation, translation, tolerances)
+
+    futures = {}
+    try:
+      with self._profiler.stage("writing"):
+        written = 0
+        for m, ((_, _, t_idx), w) in enumerate(writes):
+          #Only a few matches are packed ahead of the one being written, so the keyframes of every bone are never kept at once
+          for ahead in range(m, min(m + transfer_pack_ahead, len(writes))):
+            if ahead not in futures:
+              futures[ahead] = submit(*writes[ahead])
+          future = futures.pop(m)
+          #Waiting a little lets the worker thread run, instead of competing with it for the interpreter
+          while len(wait([future], timeout=0.005).not_done) > 0:
+            yield 0.5 + 0.5 * m / len(writes)
+          target_name = self._bones.pose_bone(target_object, t_idx).name
+          for channel, packed in future.result().items():
+            interpolation = 'LINEAR' if w[channel] == 'ANIMATED' and tolerances[channel] is not None else None
+            written += write_packed_channel(action, target_name, channel, packed, interpolation)
+          yield 0.5 + 0.5 * (m + 1) / len(writes)
+    finally:
+      #Nothing is left running if the transfer is stopped
+      for future in futures.values():
+        future.cancel()
+    self._profiler.count("keys_written", written)
+
+  def sample_origin(self, origin_object, origin_indices, frames, rows, out, channels, window=None):
+    """
+    Samples some channels of the origin bones, or copies them from the tracks shared by the transfers to several targets
+    (see transfer_to_targets), which are sampled over all the frames the first time they are needed.
+    :param origin_object: Armature object with the animation
+    :param origin_indices: List with the indices of the origin bones
+    :param frames: Array with the frames of the whole transfer
+    :param rows: Index (slice or boolean array) of the frames that are needed
+    :param out: Array of size (len(frames[rows]), len(origin_indices), C) in which the samples are stored
+    :param channels: Channels that are sampled (see bone_channels)
+    :param window: Array in which each window of frames is sampled before it is copied to out, or None (see track_buffer)
+    :return: Generator that yields the fraction of the frames that have been sampled after each step
+    """
+    if self._origin_tracks is None:
+      yield from sample_steps(bpy.context.scene, origin_object, origin_indices, frames[rows], out, channels, window)
+      self._profiler.count("frames_evaluated", out.shape[0])
+      return
+
+    if not self._origin_tracks.cached(origin_object, frames):
+      yield from self._origin_tracks.sample_steps(bpy.context.scene, origin_object, frames)
+      self._profiler.count("frames_evaluated", len(frames))
+    self._origin_tracks.read(origin_object, frames, origin_indices, rows, out, channels)
+
+  def plan_matches(self, origin_object, target_object, matches, options):
+    """
+    Plans the channels that are written on the target bone of each match (see plan_channels and plan_writes).
+    :param origin_object: Armature object with the animation
+    :param target_object: Armature object to which the animation is transferred
+    :param matches: List of indices tuples (t,i,j) as returned by get_matches
+    :param options: TransferOptions instance
+    :return: List with the dictionary {channel: 'ANIMATED' or 'CONSTANT'} of each match
+    """
+    curves = bone_fcurves(origin_object.animation_data.action)
+    driven = driven_bones(origin_object)
+    plans = {}
+    writes = []
     for r_idx, o_idx, t_idx in matches:
-      target_bone = get_pose_bone(target_object, t_idx)
-      origin_bone = get_pose_bone(origin_object, o_idx)
-      
-      for frame in range(last_frame):
-        bpy.context.scene.frame_set(frame)
-
-        target_bone.location = origin_bone.location
-        target_bone.rotation_quaternion = origin_bone.rotation_quaternion
+      origin_bone = self._bones.pose_bone(origin_object, o_idx)
+      if o_idx not in plans:
+        plans[o_idx] = plan_channels(origin_bone, curves.get(origin_bone.name, {}), origin_bone.name in driven)
+      writes.append(plan_writes(plans[o_idx], origin_bone.rotation_mode, self._bones.pose_bone(target_object, t_idx).rotation_mode,
+                                self.channel_offset(r_idx, options)[0] is not None))
+    return writes
+
+  def plan_sampling(self, origin_object, matches, writes, options):
+    """
+    :param matches: List of indices tuples (t,i,j) as returned by get_matches
+    :param writes: Dictionary {match: channels written on its target bone} (see plan_matches)
+    :return: Tuple (origin_indices, layout) with the sorted indices of the origin bones to sample and the layout of their samples (see channel_layout)
+    """
+    sources = set()
+    for match in matches:
+      origin_mode = self._bones.pose_bone(origin_object, match[1]).rotation_mode
+      sources.update(sources_of_writes(writes[match], origin_mode, self.channel_offset(match[0], options)[0] is not None))
+    return sorted(set(o_idx for _, o_idx, _ in matches)), channel_layout([channel for channel in bone_channels if channel in sources])
 
-        target_bone.keyframe_insert("location", frame=frame)
-        target_bone.keyframe_insert("rotation_quaternion", frame=frame)
-    
-    bpy.context.scene.frame_set(selected_frame)
+  def channel_offset(self, r_idx, options):
+    """
+    :param r_idx: Index of a relation
+    :param options: TransferOptions instance
+    :return: Tuple (rotation, translation) with the arrays of the offset of the relation if it is applied to the animation channels, or (None, None)
+    """
+    offset = self._relations[r_idx].get_offset()
+    if options.channel_offsets and not offset.is_identity():
+      return np.array(offset.get_rotation()), np.array(offset.get_translation())
+    return None, None
 
-    return {'FINISHED'}
+  def copy_curves(self, origin_object, target_object, action, matches, frame_range, options):
+    """
+    Copies the animated F-Curves of the origin bones onto the matched target bones, keeping the original keyframes (see plan_channels).
+    Bones whose channels are driven, constrained or have F-Curve modifiers can't be copied, since their F-Curves don't describe their final pose.
+    Neither can bones whose offset has to be applied to the channels, since it mixes the components of the channels, nor bones whose
+    rotation mode differs from the one of their target bone.
+    Nothing is copied when a custom frame range is set (options.frame_range), since the F-Curves cover the whole action.
+    :param origin_object: Armature object with the animation
+    :param target_object: Armature object to which the animation is transferred
+    :param action: Action of the target armature in which the F-Curves are written
+    :param matches: List of indices tuples (t,i,j) as returned by get_matches
+    :param frame_range: FrameRange instance whose time scale is applied to the copied keyframes
+    :param options: TransferOptions instance
+    :return: List with the matches that could not be copied and have to be sampled
+    """
+    if options.frame_range is not None:
+      #The copied keyframes would keep the animation outside of the custom frame range, so every bone is sampled
+      return list(matches)
+
+    curves = bone_fcurves(origin_object.animation_data.action)
+    driven = driven_bones(origin_object)
+    remaining = []
+
+    for match in matches:
+      r_idx, o_idx, t_idx = match
+      origin_bone = self._bones.pose_bone(origin_object, o_idx)
+      target_name = self._bones.pose_bone(target_object, t_idx).name
+      channels = curves.get(origin_bone.name, {})
+
+      if origin_bone.name in driven or \
+          any(len(fc.modifiers) > 0 for fcs in channels.values() for fc in fcs.values()) or \
+          (options.channel_offsets and not self._relations[r_idx].get_offset().is_identity()):
+        remaining.append(match)
+        continue
+
+      writes = plan_writes(plan_channels(origin_bone, channels), origin_bone.rotation_mode,
+                           self._bones.pose_bone(target_object, t_idx).rotation_mode)
+      if any(channel.startswith("rotation") and channel != rotation_channel(origin_bone.rotation_mode) for channel in writes):
+        remaining.append(match)
+        continue
+
+      for channel, status in writes.items():
+        data_path = bone_data_path(target_name, channel)
+        value = list(getattr(origin_bone, channel))
+        for i in range(len(value)):
+          source = channels.get(channel, {}).get(i)
+          if source is not None and status == 'ANIMATED':
+            copy_fcurve(source, action, data_path, i, target_name, frame_range)
+            self._profiler.count("keys_copied", len(source.keyframe_points))
+          else:
+            #Components that are not animated keep their value during the whole animation
+            if source is not None and len(source.keyframe_points) > 0:
+              value[i] = source.keyframe_points[0].co[1]
+            write_fcurve(action, data_path, i, [frame_range.start], [value[i]], target_name)
+            self._profiler.count("keys_written")
+
+    return remaining
 
 class AnimationTransfer(BaseAnimationTransfer, bpy.types.Operator):
   bl_idname = "animation.transfer_animation"
@@ -357,34 +2631,128 @@ class AnimationTransfer(BaseAnimationTransfer, bpy.types.Operator):
   
   def __init__(self, expr = []):
     if expr == []:
-      if AnimationTransfer.regular_expressions == []:
-        for b in bone_names:
-          AnimationTransfer.regular_expressions.append(Relation(b, b, None))
-        for f in finger_names:
-          for p in finger_part_names:
-            AnimationTransfer.regular_expressions.append(Relation(f + p, f + p, None))
-        AnimationTransfer.regular_expressions = list(AnimationTransfer.regular_expressions)
-      self._relations = AnimationTransfer.regular_expressions
+      self._relations = legacy_relations()
     else:
       super()
 
   def execute(self, context):
-    return self.transfer(context)
+    self._profiler = Profiler.from_scene(context.scene, self.bl_label)
+    try:
+      with self._profiler:
+        return self.transfer(context)
+    finally:
+      self._profiler.emit(self, context.scene.transfer_profile_path)
 
 
 # -----------------------------------------
-class AnimationTransferCustom(BaseAnimationTransfer, ImportHelper, bpy.types.Operator):
-  bl_idname = "animation.transfer_animation_custom"
-  bl_label = "Animation Transfer (JSON)"
+class RelationsCache():
+  """
+  Keeps the relations decoded from JSON files, so each file is only decoded once.
+  Relations are kept in memory (invalidated when the modification time or the content of the file change) and, if a directory
+  is given, also on disk, as compressed NumPy archives named after the hash of the content of the JSON file.
+  """
+  #Changed whenever the decoded relations or warnings of a file change, so older archives are not read
+  version = 2
 
-  filter_glob: StringProperty(
-    default='*.json',
-    options={'HIDDEN'}
-  )
+  def __init__(self, directory=None):
+    self.directory = directory
+    self._entries = {}
 
-  def __init__(self):
-    self._relations = []
-    self._warnings = []
+  def _archive_path(self, digest):
+    return os.path.join(self.directory, "relations_v" + str(RelationsCache.version) + "_" + digest + ".npz")
+
+  def get(self, filepath):
+    """
+    Finds the relations decoded from a JSON file.
+    :param filepath: Path of the JSON file
+    :return: Tuple (relations, warnings) with a list of Relation instances and a list of Warning instances, or None if the file is not cached
+    """
+    path = os.path.abspath(filepath)
+    stat = os.stat(path)
+    entry = self._entries.get(path)
+    if entry is not None and entry["stat"] == (stat.st_mtime_ns, stat.st_size):
+      return entry["relations"], entry["warnings"]
+
+    with open(path, 'rb') as f:
+      digest = hashlib.sha1(f.read()).hexdigest()
+    if entry is not None and entry["digest"] == digest:
+      entry["stat"] = (stat.st_mtime_ns, stat.st_size)
+      return entry["relations"], entry["warnings"]
+
+    if self.directory is None or not os.path.exists(self._archive_path(digest)):
+      return None
+    try:
+      relations, warnings = self._read(self._archive_path(digest))
+    except (OSError, ValueError, KeyError):
+      return None
+
+    self._entries[path] = {"stat": (stat.st_mtime_ns, stat.st_size), "digest": digest, "relations": relations, "warnings": warnings}
+    return relations, warnings
+
+  def put(self, filepath, content, relations, warnings):
+    """
+    Stores the relations decoded from a JSON file.
+    :param filepath: Path of the JSON file
+    :param content: Content of the JSON file from which the relations were decoded
+    :param relations: List of Relation instances
+    :param warnings: List of Warning instances
+    """
+    path = os.path.abspath(filepath)
+    stat = os.stat(path)
+    digest = hashlib.sha1(content).hexdigest()
+    relations = list(relations)
+    warnings = list(warnings)
+    self._entries[path] = {"stat": (stat.st_mtime_ns, stat.st_size), "digest": digest, "relations": relations, "warnings": warnings}
+
+    if self.directory is not None:
+      try:
+        os.makedirs(self.directory, exist_ok=True)
+        self._write(self._archive_path(digest), relations, warnings)
+      except OSError as e:
+        print("Could not write the relations cache: " + str(e))
+
+  def _write(self, archive_path, relations, warnings):
+    n = len(relations)
+    rotations = np.empty((n, 3, 3))
+    translations = np.empty((n, 3))
+    for k, r in enumerate(relations):
+      offset = r.get_offset()
+      rotations[k] = np.array(offset.get_rotation())
+      translations[k] = np.array(offset.get_translation())
+
+    #Write to a temporary file first, so other processes never read a partial archive
+    tmp_path = archive_path + "." + str(os.getpid()) + ".tmp"
+    with open(tmp_path, 'wb') as f:
+      np.savez_compressed(f,
+        origins=np.array([r.get_origin_name() for r in relations], dtype=str),
+        targets=np.array([r.get_target_name() for r in relations], dtype=str),
+        has_offset=np.array([r.has_offset() for r in relations], dtype=bool),
+        rotations=rotations,
+        translations=translations,
+        warnings=np.array([w.msg for w in warnings], dtype=str))
+    os.replace(tmp_path, archive_path)
+
+  def _read(self, archive_path):
+    with np.load(archive_path, allow_pickle=False) as archive:
+      relations = []
+      for origin, target, has_offset, rot, trans in zip(archive["origins"], archive["targets"], archive["has_offset"],
+                                                        archive["rotations"], archive["translations"]):
+        offset = Transformation(mathutils.Matrix(rot.tolist()), mathutils.Vector(trans.tolist())) if has_offset else None
+        relations.append(Relation(str(origin), str(target), offset))
+      warnings = [Warning(str(msg)) for msg in archive["warnings"]]
+    return relations, warnings
+
+
+#The relations are only written to disk if a directory is set in the environment
+relations_cache = RelationsCache(os.environ.get("ANIMATION_TRANSFER_CACHE") or None)
+
+
+# -----------------------------------------
+class RelationsParser():
+  """
+  Decodes the relations between bones from a JSON file (see example.json).
+  The classes using it must define filepath, _relations, _warnings and report.
+  """
 
   def safe_get(self, dic, prop, mandatory=True):
     """
@@ -448,34 +2816,39 @@ class AnimationTransferCustom(BaseAnimationTransfer, ImportHelper, bpy.types.Ope
      - Rotation matrix
      (and their corresponding values).
      It can also be set to 'identity'.
+    All the orientations with the same codification are decoded at once (see decode_rotations).
     :returns:
-      - t: A mathutils.Matrix encoding the transformation from the origin bone to the target bone
+      - t: A list of Transformation instances encoding the transformation from the origin bone to the target bone
       - warnings: A list of warnings that may have appeared during the execution (for example, if position or orientation elements).
     :raises:
       - JSONDecodeError: If any of the rotation codifications was malformed, including information on what went wrong.
     """
-    result = []
     if not isinstance(offset, list):
       raise json.JSONDecodeError("Malformed JSON: Offset of a bone must always be a list.", self.filepath, -1)
+
+    positions = []
+    rotations = []
+    warnings = []
+    #Values of the orientations that are not decoded yet, by codification: [(index, values)]
+    pending = defaultdict(list)
+
     for t in offset:
       position = self.safe_get(t, 'position', False)
       orientation = self.safe_get(t, 'orientation', False)
-      warnings = []
 
       if position is None:
         warnings.append(Warning("Position was not specified in offset field. Assuming the position offset to be none."))
-        pos = mathutils.Vector((0, 0, 0))
-
+        positions.append(mathutils.Vector((0, 0, 0)))
       else:
-        pos = position
+        positions.append(position)
 
+      rotations.append(mathutils.Matrix.Identity(3))
 
       if orientation is None:
         warnings.append(Warning("Orientation was not specified in offset field. Assuming the orientation offset to be none."))
-        rot = mathutils.Matrix.Identity(3)
 
       elif orientation == 'identity':
-        rot = mathutils.Matrix.Identity(3)
+        pass
 
       else:
         codif = self.safe_get(orientation, 'codification')
@@ -487,8 +2860,6 @@ class AnimationTransferCustom(BaseAnimationTransfer, ImportHelper, bpy.types.Ope
           if len(values) != 4:
             raise json.JSONDecodeError("Malformed JSON: Quaternion codification is not correct. (Must include [qx, qy, qz, qw]", self.filepath, -1)
 
-          rot = mathutils.Quaternion(values).to_matrix()
-
         elif codif == 'rpy':
           #'roll', 'pitch', 'yaw' fields
           roll = self.safe_get(values, 'roll', False)
@@ -496,28 +2867,27 @@ class AnimationTransferCustom(BaseAnimationTransfer, ImportHelper, bpy.types.Ope
           yaw = self.safe_get(values, 'yaw', False)
           if not isinstance(values, dict) or roll is None or pitch is None or yaw is None:
             raise json.JSONDecodeError("Malformed JSON: RPY codification is not correct. (Must be a dictionary including 'roll', 'pitch' and 'yaw' fields)", self.filepath, -1)
-
-          rot = MyEuler((roll, pitch, yaw), 'XYZ').to_matrix()
+          values = [roll, pitch, yaw]
 
         elif codif == 'euler':
           #[Z, X, Z]
           if len(values) != 3:
             raise json.JSONDecodeError("Malformed JSON: Euler codification is not correct. (Must include [phi (Z), theta (X), psi (Z)]", self.filepath, -1)
-          rot = euler_zxz(values).to_matrix()
 
         elif codif == 'axis_angle':
           # for i = 1..3:
           #   [axis_i (vector), th_i] OR [x_i, y_i, z_i, th_i]
-          rot = mathutils.Matrix.Identity(3)
           if len(values) != 3:
             raise json.JSONDecodeError("Malformed JSON: Axis-angle codification is not correct. (Must include 3 elements of the form [[axis_i], angle_i] or [axis_i_x, axis_i_y, axis_i_z, angle_i]", self.filepath, -1)
-          for i,aa in enumerate(values):
+          aa_values = []
+          for aa in values:
             if len(aa) == 4:
-              rot = rot @ mathutils.Rotation(values[i][3], 3, values[i][0:3])
-            elif (len(aa) == 2 and len(aa[0]) == 3 and isinstance(aa[1], float)):
-              rot = rot @ mathutils.Rotation(values[i][1], 3, values[i][0])
+              aa_values.append(list(aa))
+            elif (len(aa) == 2 and len(aa[0]) == 3 and isinstance(aa[1], (int, float))):
+              aa_values.append(list(aa[0]) + [aa[1]])
             else:
               raise json.JSONDecodeError("Malformed JSON: Axis-angle codification is not correct: (Must include 3 elements of the form [[axis_i], angle_i] or [axis_i_x, axis_i_y, axis_i_z, angle_i]", self.filepath, -1)
+          values = aa_values
 
         elif codif == 'rotation_matrix':
           # [first row, second row, third row] (all vectors of size 3)
@@ -526,10 +2896,11 @@ class AnimationTransferCustom(BaseAnimationTransfer, ImportHelper, bpy.types.Ope
           for i in values:
             if len(i) != 3:
               raise json.JSONDecodeError("Malformed JSON: Rotation matrix codification is not correct: (Must include [[nx, ox, ax], [ny, oy, ay], [nz, oz, az]]", self.filepath, -1)
-          rot = mathutils.Matrix(values)
 
         else:
           raise json.JSONDecodeError("Malformed JSON: Unknown codification: " + codif + ".\nPossible values: 'quaternion', 'rpy', 'euler', 'axis_angle' and 'rotation_matrix'.", self.filepath, -1)
+
+        pending[codif].append((len(rotations) - 1, values))
       
       #if switch_axes is not None:
       #  if not isinstance(switch_axes, dict):
@@ -542,9 +2913,13 @@ class AnimationTransferCustom(BaseAnimationTransfer, ImportHelper, bpy.types.Ope
       #  basis = create_switch_axes((X, Y, Z))
       #  rot = basis @ rot
 
-      t = Transformation(rot, pos)
-      
-      result.append(t)
+    #Decode all the orientations with the same codification at once
+    for codif, items in pending.items():
+      matrices = decode_rotations(codif, [values for _, values in items])
+      for (k, _), m in zip(items, matrices):
+        rotations[k] = mathutils.Matrix(m.tolist())
+
+    result = [Transformation(rot, pos) for rot, pos in zip(rotations, positions)]
     return result, warnings
 
   def expand_rel(self, rel):
@@ -572,7 +2947,8 @@ class AnimationTransferCustom(BaseAnimationTransfer, ImportHelper, bpy.types.Ope
       raise json.JSONDecodeError("Malformed JSON: The number of suffixes in origin bones must match the suffixes on target bones, or target's should be left empty." + str(len(origin_exp)) + " != " + str(len(target_exp)), self.filepath, -1)
 
     if offset is not None:
-      offset_t, _ = self.expand_offset(offset)
+      offset_t, offset_warnings = self.expand_offset(offset)
+      w += offset_warnings
     else:
       offset_t = list(itertools.repeat(None, len(origin_exp)))
     
@@ -600,21 +2976,313 @@ class AnimationTransferCustom(BaseAnimationTransfer, ImportHelper, bpy.types.Ope
 
     return 0
 
-  def execute(self, context):
-    f = open(self.filepath, 'r')
-    print('Chosen file', self.filepath)
+  def load_relations(self, filepath=None):
+    """
+    Reads a JSON file and decodes its relations.
+    :param filepath: Path of the JSON file. If None, self.filepath is read.
+    :return: 0 if the relations were decoded, a different value otherwise (errors are reported with self.report)
+    """
+    if filepath is None:
+      filepath = self.filepath
+    with self._profiler.stage("relations_cache"):
+      cached = relations_cache.get(filepath)
+    if cached is not None:
+      relations, warnings = cached
+      self._relations += relations
+      self._warnings += warnings
+      self._profiler.count("cached_relations", len(relations))
+      return 0
+
+    with open(filepath, 'rb') as f:
+      content = f.read()
+    n_relations = len(self._relations)
+    n_warnings = len(self._warnings)
     try:
-      data = json.load(f)
+      with self._profiler.stage("json_parse"):
+        data = json.loads(content.decode('utf-8'))
+      with self._profiler.stage("relation_expansion"):
+        ret = self.expand_relations(data)
     except json.JSONDecodeError as e:
       self.report({'ERROR'}, "Malformed JSON: " + str(e))
+      return -2
+    self._profiler.count("relations", len(self._relations) - n_relations)
+
+    if ret == 0:
+      with self._profiler.stage("relations_cache"):
+        relations_cache.put(filepath, content, self._relations[n_relations:], self._warnings[n_warnings:])
+    return ret
+
+
+# -----------------------------------------
+class AnimationTransferCustom(RelationsParser, BaseAnimationTransfer, ImportHelper, bpy.types.Operator):
+  bl_idname = "animation.transfer_animation_custom"
+  bl_label = "Animation Transfer (JSON)"
+
+  filter_glob: StringProperty(
+    default='*.json',
+    options={'HIDDEN'}
+  )
+
+  def __init__(self):
+    self._relations = []
+    self._warnings = []
+
+  def execute(self, context):
+    print('Chosen file', self.filepath)
+    self._profiler = Profiler.from_scene(context.scene, self.bl_label)
+    try:
+      with self._profiler:
+        if self.load_relations() != 0:
+          return {'CANCELLED'}
+
+        for w in self._warnings:
+          self.report({'WARNING'}, w.msg)
+
+        return self.transfer(context)
+    finally:
+      self._profiler.emit(self, context.scene.transfer_profile_path)
+# -------------------------------------------------------------------------------------------
+
+# -----------------------------------------
+class ModalTransfer():
+  """
+  Runs the transfer of an operator in steps from a timer, so the interface keeps working and the panel shows the progress.
+  The NumPy work of the transfer runs in a worker thread. Pressing Esc cancels the transfer and undoes its changes (see TransferUndo).
+  Meanwhile the view can be navigated, but the events that could undo or edit the armatures and actions are consumed.
+  """
+  #Maximum time (in seconds) of the steps run on each event of the timer
+  step_time = 0.05
+  #Events that reach the interface while the transfer runs, besides the timers of other handlers
+  navigation_events = {'MOUSEMOVE', 'INBETWEEN_MOUSEMOVE', 'MIDDLEMOUSE', 'WHEELUPMOUSE', 'WHEELDOWNMOUSE', 'WHEELINMOUSE',
+                       'WHEELOUTMOUSE', 'TRACKPADPAN', 'TRACKPADZOOM', 'MOUSEROTATE', 'MOUSESMARTZOOM', 'NDOF_MOTION',
+                       'NUMPAD_0', 'NUMPAD_1', 'NUMPAD_2', 'NUMPAD_3', 'NUMPAD_4', 'NUMPAD_5', 'NUMPAD_6', 'NUMPAD_7',
+                       'NUMPAD_8', 'NUMPAD_9', 'NUMPAD_PERIOD', 'NUMPAD_PLUS', 'NUMPAD_MINUS', 'HOME',
+                       'WINDOW_DEACTIVATE'}
+
+  def start(self, context):
+    """
+    Starts the transfer between the selected armatures.
+    :return: {'RUNNING_MODAL'} if the transfer started, {'CANCELLED'} otherwise
+    """
+    wm = context.window_manager
+    if wm.transfer_running:
+      self.report({'ERROR'}, "Wait until the running transfer finishes.")
+      return {'CANCELLED'}
+    armatures = self.selected_armatures()
+    if armatures is None:
+      return {'CANCELLED'}
+
+    self._armatures = armatures
+    self._undo = TransferUndo(armatures[1])
+    self._actions = self.used_actions()
+    self._executor = ThreadPoolExecutor(max_workers=1)
+    self._steps = self.transfer_steps(armatures[0], armatures[1], TransferOptions.from_scene(context.scene))
+    wm.transfer_progress = 0.0
+    wm.transfer_running = True
+    self._timer = wm.event_timer_add(0.01, window=context.window)
+    wm.modal_handler_add(self)
+    return {'RUNNING_MODAL'}
+
+  def modal(self, context, event):
+    if event.type == 'ESC':
+      self.stop(context, True)
+      self.report({'WARNING'}, "The transfer was cancelled.")
+      return {'CANCELLED'}
+    if event.type != 'TIMER' or event.timer != self._timer:
+      if event.type in self.navigation_events or event.type.startswith('TIMER'):
+        return {'PASS_THROUGH'}
+      return {'RUNNING_MODAL'}
+
+    #The steps keep references to the armatures and actions, so the transfer cannot go on if any of them was removed
+    if not all(id_exists(obj, bpy.data.objects) for obj in self._armatures) or \
+       not all(id_exists(action, bpy.data.actions) for action in self._actions):
+      self.stop(context, True)
+      self.report({'ERROR'}, "The transfer was cancelled because its armatures or actions were removed.")
+      return {'CANCELLED'}
+
+    start = time.perf_counter()
+    try:
+      while time.perf_counter() - start < self.step_time:
+        context.window_manager.transfer_progress = next(self._steps)
+      self._actions = self.used_actions()
+    except StopIteration as stop:
+      self.stop(context, stop.value != {'FINISHED'})
+      return stop.value
+    except Exception as e:
+      self.stop(context, True)
+      self.report({'ERROR'}, "The transfer failed: " + str(e))
       return {'CANCELLED'}
-    if self.expand_relations(data) != 0:
+    self.redraw(context)
+    return {'RUNNING_MODAL'}
+
+  def cancel(self, context):
+    self.stop(context, True)
+
+  def used_actions(self):
+    """
+    :return: List with the active actions of the armatures and the actions created or modified by the transfer
+    """
+    actions = [obj.animation_data.action for obj in self._armatures if obj.animation_data is not None and obj.animation_data.action is not None]
+    return actions + self._undo.created + [action for pair in self._undo.backups.values() for action in pair]
+
+  def stop(self, context, cancelled):
+    """
+    Ends the transfer, undoing its changes if it was cancelled.
+    """
+    wm = context.window_manager
+    wm.event_timer_remove(self._timer)
+    #Closing the steps restores the origin armature and the scene, and cancels the work left for the worker thread
+    try:
+      self._steps.close()
+    except ReferenceError:
+      #The origin armature was removed meanwhile
+      pass
+    self._executor.shutdown(wait=True)
+    if cancelled:
+      self._undo.restore()
+    else:
+      self._undo.apply()
+    wm.transfer_running = False
+    self.redraw(context)
+
+  def redraw(self, context):
+    for window in context.window_manager.windows:
+      for area in window.screen.areas:
+        if area.type == 'VIEW_3D':
+          area.tag_redraw()
+
+class AnimationTransferModal(ModalTransfer, AnimationTransfer):
+  bl_idname = "animation.transfer_animation_modal"
+  bl_label = "Legacy Animation Transfer (Interactive)"
+
+  def execute(self, context):
+    return self.start(context)
+
+class AnimationTransferCustomModal(ModalTransfer, AnimationTransferCustom):
+  bl_idname = "animation.transfer_animation_custom_modal"
+  bl_label = "Animation Transfer (JSON, Interactive)"
+
+  def execute(self, context):
+    if self.load_relations() != 0:
       return {'CANCELLED'}
 
     for w in self._warnings:
       self.report({'WARNING'}, w.msg)
-    
-    return self.transfer(context)
+
+    return self.start(context)
+# -------------------------------------------------------------------------------------------
+
+# -----------------------------------------
+class AnimationTransferClip(RelationsParser, BaseAnimationTransfer, ImportHelper, bpy.types.Operator):
+  bl_idname = "animation.transfer_animation_clip"
+  bl_label = "Animation Transfer (Clip)"
+
+  filter_glob: StringProperty(
+    default='*.atclip',
+    options={'HIDDEN'}
+  )
+
+  def __init__(self):
+    self._relations = []
+    self._warnings = []
+
+  def execute(self, context):
+    self._profiler = Profiler.from_scene(context.scene, self.bl_label)
+    try:
+      with self._profiler:
+        return self.transfer_file(context)
+    finally:
+      self._profiler.emit(self, context.scene.transfer_profile_path)
+
+  def transfer_file(self, context):
+    if bpy.context.active_object is None:
+      self.report({'ERROR'}, "Could not retrieve target object.")
+      return {'CANCELLED'}
+    ret_t, target_object = find_armature(bpy.context.active_object)
+    if not ret_t:
+      self.report({'ERROR'}, "Target object " + bpy.context.active_object.name + " does not have an armature")
+      return {'CANCELLED'}
+
+    #The relations are read from the JSON file set in the scene, or the legacy ones are used
+    if context.scene.transfer_clip_relations == "":
+      self._relations = legacy_relations()
+    elif self.load_relations(bpy.path.abspath(context.scene.transfer_clip_relations)) != 0:
+      return {'CANCELLED'}
+    for w in self._warnings:
+      self.report({'WARNING'}, w.msg)
+
+    try:
+      clip = Clip(self.filepath)
+    except (OSError, ValueError) as e:
+      self.report({'ERROR'}, "Could not read the clip: " + str(e))
+      return {'CANCELLED'}
+
+    return self.transfer_clip(clip, target_object, TransferOptions.from_scene(context.scene))
+# -------------------------------------------------------------------------------------------
+
+# -----------------------------------------
+class AnimationTransferTargets(RelationsParser, BaseAnimationTransfer, ImportHelper, bpy.types.Operator):
+  """
+  Transfers the animation of the active armature to every other selected armature, sampling the origin only once.
+  Each target uses the relations of the JSON file in its relations_property custom property, or the chosen JSON file.
+  """
+  bl_idname = "animation.transfer_animation_targets"
+  bl_label = "Animation Transfer to Selected (JSON)"
+
+  filter_glob: StringProperty(
+    default='*.json',
+    options={'HIDDEN'}
+  )
+
+  def __init__(self):
+    self._relations = []
+    self._warnings = []
+
+  def execute(self, context):
+    self._profiler = Profiler.from_scene(context.scene, self.bl_label)
+    try:
+      with self._profiler:
+        return self.transfer_selected(context)
+    finally:
+      self._profiler.emit(self, context.scene.transfer_profile_path)
+
+  def transfer_selected(self, context):
+    if bpy.context.active_object is None:
+      self.report({'ERROR'}, "Could not retrieve origin object.")
+      return {'CANCELLED'}
+    ret_o, origin_object = find_armature(bpy.context.active_object)
+    if not ret_o:
+      self.report({'ERROR'}, "Origin object " + bpy.context.active_object.name + " does not have an armature")
+      return {'CANCELLED'}
+
+    target_objects = []
+    for obj in bpy.context.selected_objects:
+      ret_t, target_object = find_armature(obj)
+      if ret_t and target_object != origin_object and target_object not in target_objects:
+        target_objects.append(target_object)
+    if len(target_objects) == 0:
+      self.report({'ERROR'}, "Select the target objects and then the origin object.")
+      return {'CANCELLED'}
+
+    #The relations of each file are loaded once, even if several targets use them
+    loaded = {}
+    targets = []
+    for target_object in target_objects:
+      filepath = bpy.path.abspath(target_object.get(relations_property, "")) or self.filepath
+      if filepath not in loaded:
+        self._relations = []
+        self._warnings = []
+        if self.load_relations(filepath) != 0:
+          return {'CANCELLED'}
+        for w in self._warnings:
+          self.report({'WARNING'}, w.msg)
+        loaded[filepath] = self._relations
+      targets.append((target_object, loaded[filepath]))
+
+    results = self.transfer_to_targets(origin_object, targets, TransferOptions.from_scene(context.scene))
+    done = [t.name for (t, _), r in zip(targets, results) if r == {'FINISHED'}]
+    self.report({'INFO'}, "Transferred the animation to " + str(len(done)) + " of " + str(len(targets)) + " armatures")
+    return {'FINISHED'} if len(done) > 0 else {'CANCELLED'}
 # -------------------------------------------------------------------------------------------
 
 # -----------------------------------------
@@ -634,6 +3302,14 @@ class RemoveRootMovement(bpy.types.Operator):
       return -1
 
     def execute(self, context):
+      profiler = Profiler.from_scene(context.scene, self.bl_label)
+      try:
+        with profiler:
+          return self.make_stationary(context, profiler)
+      finally:
+        profiler.emit(self, context.scene.transfer_profile_path)
+
+    def make_stationary(self, context, profiler):
 
       selected_objects = bpy.context.selected_objects
 
@@ -649,31 +3325,334 @@ class RemoveRootMovement(bpy.types.Operator):
         return {'CANCELLED'}
       
       #Get the animation
-      animation = target_object.animation_data.action
-      if animation == None:
-        self.report({'WARN'}, "Target object " + target_object.name + " does not have an animation. No operation applied.")
+      if target_object.animation_data is None or target_object.animation_data.action is None:
+        self.report({'WARNING'}, "Target object " + target_object.name + " does not have an animation. No operation applied.")
         return {'CANCELLED'}
-            
-      selected_frame = bpy.context.scene.frame_current
-      idx = self.get_root_idx(target_object.data.bones)
+      animation = target_object.animation_data.action
+
+      with profiler.stage("matching"):
+        idx = self.get_root_idx(target_object.data.bones)
 
       if idx == -1:
         self.report({'ERROR'}, "Could not find 'root' bone.")
         return {'CANCELLED'}
 
-      ini_location = mathutils.Vector((0.0, 0.0, 0.0))
-
-      #Delete all location keyframes from root
-      for frame in range(ceil(animation.frame_range[1]) + 1):
-        bpy.context.scene.frame_set(frame)
-        get_pose_bone(target_object, idx).location = ini_location
-        get_pose_bone(target_object, idx).keyframe_insert("location", frame=frame)
-
-      bpy.context.scene.frame_set(selected_frame)
+      root_bone = BoneCache().pose_bone(target_object, idx)
+      with profiler.stage("root_motion"):
+        remove_root_motion(target_object, animation, root_bone, context.scene.root_strip_axes, context.scene.root_motion_mode,
+                           simplify_tolerances(context.scene))
+      data_path = bone_data_path(root_bone.name, "location")
+      profiler.count("keys_edited", sum(len(fc.keyframe_points) for fc in animation.fcurves if fc.data_path == data_path))
       
       return {'FINISHED'}
 
 
+def flatten_fcurve(fcurve, value=0.0):
+  """
+  Sets the value of all the keyframes (and their handles) of an F-Curve, keeping their frames.
+  :param fcurve: F-Curve to modify
+  :param value: New value of the keyframes
+  """
+  n = len(fcurve.keyframe_points)
+  buffer = np.empty(2 * n, dtype=np.float32)
+  for attr in ('co', 'handle_left', 'handle_right'):
+    fcurve.keyframe_points.foreach_get(attr, buffer)
+    buffer[1::2] = value
+    fcurve.keyframe_points.foreach_set(attr, buffer)
+  fcurve.update()
+
+def remove_root_motion(armature, action, root_bone, axes=(True, True, True), extract='NONE', simplify=None):
+  """
+  Removes the translation of the root bone of an armature by editing its location F-Curves directly, without evaluating the scene.
+  :param armature: Armature object
+  :param action: Action of the armature
+  :param root_bone: Pose bone whose translation is removed
+  :param axes: For each component of the location of the root bone (X, Y, Z), whether it is removed
+  :param extract: What to do with the removed translation:
+    - 'NONE': It is discarded
+    - 'ACTION': It is kept on the 'location' F-Curves of a new action, named after the original action with the suffix '_root_motion'
+    - 'OBJECT': As 'ACTION', and the action is assigned to a new empty object parented to the armature, which follows the removed translation
+  :param simplify: Dictionary {channel: tolerance} to simplify the modified F-Curves (see simplify_fcurves), or None
+  :return: The action with the removed translation, or None if extract is 'NONE'
+  """
+  data_path = bone_data_path(root_bone.name, "location")
+  frame_start = floor(action.frame_range[0])
+
+  motion = None
+  if extract != 'NONE':
+    motion = bpy.data.actions.new(action.name + "_root_motion")
+    motion.use_fake_user = True
+
+  for axis in range(3):
+    if not axes[axis]:
+      continue
+
+    fcurve = action.fcurves.find(data_path, index=axis)
+    if fcurve is None:
+      #The location is not animated, so the root bone keeps its value during the whole animation
+      value = root_bone.location[axis]
+      if motion is not None:
+        write_fcurve(motion, "location", axis, [frame_start], [value], "Root Motion")
+      if value != 0:
+        write_fcurve(action, data_path, axis, [frame_start], [0.0], root_bone.name)
+      continue
+
+    if motion is not None:
+      copy_fcurve(fcurve, motion, "location", axis, "Root Motion")
+    flatten_fcurve(fcurve)
+    if simplify is not None and "location" in simplify:
+      simplify_fcurves([fcurve], simplify["location"])
+
+  if extract == 'OBJECT':
+    empty = bpy.data.objects.new(armature.name + "_root_motion", None)
+    armature.users_collection[0].objects.link(empty)
+    empty.parent = armature
+    #The removed translation is expressed in the rest frame of the root bone
+    empty.matrix_parent_inverse = armature.data.bones[root_bone.name].matrix_local.copy()
+    empty.animation_data_create()
+    empty.animation_data.action = motion
+
+  return motion
+
+
+# -----------------------------------------
+class HeadlessTransfer(RelationsParser, BaseAnimationTransfer):
+  """
+  Animation transfer that does not depend on the selection nor on the interface, so it can run in background (blender -b).
+  Messages are printed to the standard output instead of being shown in popups.
+  """
+  def __init__(self, filepath=None):
+    self.filepath = filepath
+    self._warnings = []
+    self.messages = []
+    if filepath is None:
+      self._relations = legacy_relations()
+    else:
+      self._relations = []
+
+  def report(self, level, message):
+    level = next(iter(level))
+    self.messages.append((level, message))
+    print(level + ": " + message)
+
+  def notify(self, title, message):
+    #The same message is always reported too
+    pass
+
+
+def load_objects(filepath):
+  """
+  Loads all the objects of a file (.blend, .fbx or .bvh) into the current scene.
+  :param filepath: Path of the file
+  :return: List with the loaded objects
+  :raises:
+    ValueError - If the format of the file is not supported
+  """
+  before = set(bpy.data.objects.keys())
+  ext = os.path.splitext(filepath)[1].lower()
+  if ext == '.blend':
+    with bpy.data.libraries.load(filepath, link=False) as (data_from, data_to):
+      data_to.objects = data_from.objects
+      #Actions not assigned to any object are loaded too, so they can be transferred
+      data_to.actions = data_from.actions
+    for obj in data_to.objects:
+      if obj is not None:
+        bpy.context.scene.collection.objects.link(obj)
+  elif ext == '.fbx':
+    bpy.ops.import_scene.fbx(filepath=filepath)
+  elif ext == '.bvh':
+    bpy.ops.import_anim.bvh(filepath=filepath)
+  else:
+    raise ValueError("Unsupported file format: " + filepath)
+  return [obj for obj in bpy.data.objects if obj.name not in before]
+
+def pick_armature(objects, name=None):
+  """
+  Finds an armature object in a list of objects.
+  :param objects: List of objects
+  :param name: Name of the armature object. If None, the first armature object is returned.
+  :return: The armature object, or None if it was not found
+  """
+  for obj in objects:
+    if obj.type == 'ARMATURE' and (name is None or obj.name == name):
+      return obj
+  return None
+
+def retarget_files(origin_path, target_paths, relations_path=None, output_dir=None, options=None,
+                   origin_armature=None, target_armature=None, keep_origin=False, profile=False, use_cprofile=False,
+                   export_clips=False):
+  """
+  Transfers the animation of an origin file to several target files, saving each result as a new .blend file.
+  :param origin_path: File (.blend, .fbx or .bvh) with the animated origin armature, or clip file (.atclip, see Clip) with the origin animation
+  :param target_paths: List of files (.blend, .fbx or .bvh) with the target armatures
+  :param relations_path: JSON file with the relations between bones. If None, the legacy (u3d) relations are used.
+  :param output_dir: Directory in which the results are saved. If None, each result is saved next to its target file.
+  :param options: TransferOptions instance. If None, the default options are used.
+  :param origin_armature: Name of the origin armature object. If None, the first armature in the origin file is used.
+  :param target_armature: Name of the target armature object. If None, the first armature in each target file is used.
+  :param keep_origin: Whether to keep the origin objects in the saved files.
+  :param profile: Whether to measure the stages of each transfer (see Profiler)
+  :param use_cprofile: Whether to include a cProfile capture in the profile of each transfer
+  :param export_clips: Whether to export the animation of each target to a clip file (see ClipWriter) next to its output file
+  :return: List with, for each target, a dictionary with the target and output paths, the status, the reported messages, the time (in seconds)
+    and, if profile is set, the profile of the transfer (with the profile of the loading of the relations in profile["relations"])
+  """
+  if options is None:
+    options = TransferOptions()
+
+  transfer = HeadlessTransfer(relations_path)
+  error = options.frame_range_error()
+  if error is not None:
+    transfer.report({'ERROR'}, error)
+    return [{"target": t, "output": None, "status": 'CANCELLED', "messages": transfer.messages, "time": 0.0} for t in target_paths]
+  relations_profiler = Profiler("load_relations", profile)
+  transfer._profiler = relations_profiler
+  with relations_profiler:
+    failed = relations_path is not None and transfer.load_relations() != 0
+  if failed:
+    return [{"target": t, "output": None, "status": 'CANCELLED', "messages": transfer.messages, "time": 0.0} for t in target_paths]
+  for w in transfer._warnings:
+    transfer.report({'WARNING'}, w.msg)
+  relation_messages = list(transfer.messages)
+
+  #Clips are transferred directly, without loading any origin armature
+  clip = None
+  if origin_path.lower().endswith('.atclip'):
+    try:
+      clip = Clip(origin_path)
+    except (OSError, ValueError) as e:
+      transfer.report({'ERROR'}, "Could not read the clip: " + str(e))
+      return [{"target": t, "output": None, "status": 'CANCELLED', "messages": transfer.messages, "time": 0.0} for t in target_paths]
+
+  results = []
+  for target_path in target_paths:
+    transfer.messages = list(relation_messages)
+    name = os.path.splitext(os.path.basename(target_path))[0] + "_retargeted.blend"
+    output = os.path.join(output_dir if output_dir is not None else os.path.dirname(target_path), name)
+    result = {"target": target_path, "output": None, "status": 'CANCELLED', "messages": transfer.messages, "time": 0.0}
+    results.append(result)
+    start = time.perf_counter()
+    profiler = Profiler("retarget " + target_path, profile, use_cprofile)
+    transfer._profiler = profiler
+
+    try:
+      with profiler:
+        with profiler.stage("load"):
+          if options.incremental and not keep_origin and os.path.exists(output):
+            #The previous result is updated instead of transferring everything again
+            bpy.ops.wm.open_mainfile(filepath=output)
+            target_objects = list(bpy.context.scene.objects)
+          elif target_path.lower().endswith('.blend'):
+            bpy.ops.wm.open_mainfile(filepath=target_path)
+            target_objects = list(bpy.context.scene.objects)
+          else:
+            bpy.ops.wm.read_factory_settings(use_empty=True)
+            target_objects = load_objects(target_path)
+          origin_objects = load_objects(origin_path) if clip is None else []
+
+        origin_object = pick_armature(origin_objects, origin_armature)
+        target_object = pick_armature(target_objects, target_armature)
+        if origin_object is None and clip is None:
+          transfer.report({'ERROR'}, "Could not find the origin armature in " + origin_path)
+          continue
+        if target_object is None:
+          transfer.report({'ERROR'}, "Could not find the target armature in " + target_path)
+          continue
+
+        target_options = options
+        if export_clips:
+          #Each target exports its clip next to its output file
+          target_options = copy(options)
+          target_options.export_clip = os.path.splitext(output)[0] + ".atclip"
+        if clip is not None:
+          result["status"] = next(iter(transfer.transfer_clip(clip, target_object, target_options)))
+        else:
+          result["status"] = next(iter(transfer.transfer_objects(origin_object, target_object, target_options)))
+        if result["status"] != 'FINISHED':
+          continue
+
+        with profiler.stage("save"):
+          if not keep_origin:
+            for obj in origin_objects:
+              bpy.data.objects.remove(obj, do_unlink=True)
+          bpy.ops.wm.save_as_mainfile(filepath=output)
+        result["output"] = output
+    except Exception as e:
+      transfer.report({'ERROR'}, "Could not transfer the animation to " + target_path + ": " + repr(e))
+      result["status"] = 'CANCELLED'
+    finally:
+      result["time"] = time.perf_counter() - start
+      if profile:
+        result["profile"] = profiler.to_dict()
+        result["profile"]["relations"] = relations_profiler.to_dict()
+
+  return results
+
+def main(argv):
+  """
+  Entry point for the background mode:
+    blender -b --python animation_transfer.py -- --origin <file> --targets <file> [<file> ...] [--relations <json>]
+  :param argv: List of the arguments after '--'
+  :return: Exit code (0 if the animation was transferred to every target)
+  """
+  parser = argparse.ArgumentParser(prog="blender -b --python animation_transfer.py --",
+    description="Transfers the animation of an origin armature to the armatures of several target files.")
+  parser.add_argument("--origin", required=True, help="File (.blend, .fbx or .bvh) with the animated origin armature, or clip file (.atclip)")
+  parser.add_argument("--targets", required=True, nargs='+', help="Files (.blend, .fbx or .bvh) with the target armatures")
+  parser.add_argument("--relations", help="JSON file with the relations between bones. If omitted, the legacy (u3d) relations are used")
+  parser.add_argument("--output-dir", help="Directory in which the results are saved. By default, next to each target file")
+  parser.add_argument("--origin-armature", help="Name of the origin armature object. By default, the first armature found")
+  parser.add_argument("--target-armature", help="Name of the target armature object. By default, the first armature found")
+  parser.add_argument("--keep-origin", action='store_true', help="Keep the origin objects in the saved files")
+  parser.add_argument("--no-bulk-write", action='store_true', help="Insert the keyframes one by one")
+  parser.add_argument("--curve-copy", action='store_true', help="Copy the F-Curves of the origin bones when possible")
+  parser.add_argument("--channel-offsets", action='store_true', help="Apply the offsets to the animation channels instead of the rest pose")
+  parser.add_argument("--simplify-location", type=float, help="Simplify the location keyframes with this tolerance")
+  parser.add_argument("--simplify-rotation", type=float, help="Simplify the rotation keyframes with this tolerance")
+  parser.add_argument("--frame-range", type=int, nargs=2, metavar=('START', 'END'), help="Frames to sample. By default, the frame range of the origin animation")
+  parser.add_argument("--frame-step", type=float, default=1.0, help="Number of frames between two samples")
+  parser.add_argument("--time-scale", type=float, default=1.0, help="Factor applied to the time of the transferred keyframes")
+  parser.add_argument("--actions", nargs='+', default=['ACTIVE'],
+    help="Actions of the origin armature to transfer: ACTIVE, NLA, ALL or a list of action names")
+  parser.add_argument("--incremental", action='store_true',
+    help="If the output file of a target exists, only rewrite the bones and frames that changed since it was saved")
+  parser.add_argument("--sample-window", type=int, default=4096,
+    help="Maximum number of frames whose samples are kept in memory. Longer animations are sampled into a temporary file (0 keeps every frame in memory)")
+  parser.add_argument("--export-clips", action='store_true', help="Export the animation of each target to a clip file next to its output file")
+  parser.add_argument("--clip-full-precision", action='store_true', help="Store the clips with 32 bit floats instead of float16 locations and int16 rotations")
+  parser.add_argument("--profile", action='store_true', help="Include the time of each stage and the counters of each transfer in the report")
+  parser.add_argument("--cprofile", action='store_true', help="Include a cProfile capture of each transfer in the report (implies --profile)")
+  parser.add_argument("--report", help="JSON file in which the result of each target is written")
+  args = parser.parse_args(argv)
+
+  simplify = None
+  if args.simplify_location is not None or args.simplify_rotation is not None:
+    simplify = {}
+    if args.simplify_location is not None:
+      simplify["location"] = args.simplify_location
+    if args.simplify_rotation is not None:
+      simplify["rotation_quaternion"] = args.simplify_rotation
+  actions = args.actions[0] if len(args.actions) == 1 and args.actions[0] in ('ACTIVE', 'NLA', 'ALL') else args.actions
+  options = TransferOptions(bulk_write=not args.no_bulk_write, curve_copy=args.curve_copy, channel_offsets=args.channel_offsets,
+                            simplify=simplify, frame_range=args.frame_range, frame_step=args.frame_step, time_scale=args.time_scale,
+                            actions=actions, clip_half_location=not args.clip_full_precision,
+                            clip_quantize_rotation=not args.clip_full_precision, incremental=args.incremental,
+                            sample_window=args.sample_window)
+  results = retarget_files(args.origin, args.targets, args.relations, args.output_dir, options,
+                           args.origin_armature, args.target_armature, args.keep_origin, args.profile or args.cprofile, args.cprofile,
+                           args.export_clips)
+
+  if args.report is not None:
+    with open(args.report, 'w') as f:
+      json.dump(results, f, indent=2)
+
+  failed = [r["target"] for r in results if r["status"] != 'FINISHED']
+  print("Transferred the animation to " + str(len(results) - len(failed)) + " of " + str(len(results)) + " targets.")
+  for t in failed:
+    print("Failed: " + t)
+  return 0 if len(failed) == 0 else 1
+
+
 def register():
   bpy.types.Scene.root_bone_name = bpy.props.StringProperty \
       (
@@ -681,16 +3660,241 @@ def register():
         description = "The name of the bone which we want to be stationary",
         default = 'root'
       )
+  bpy.types.Scene.root_strip_axes = bpy.props.BoolVectorProperty \
+      (
+        name = "Remove",
+        description = "Components of the location of the root bone that are removed",
+        default = (True, True, True),
+        size = 3,
+        subtype = 'XYZ'
+      )
+  bpy.types.Scene.root_motion_mode = bpy.props.EnumProperty \
+      (
+        name = "Root motion",
+        description = "What to do with the removed translation",
+        items = [
+          ('NONE', "Discard", "Discard the removed translation"),
+          ('ACTION', "Action", "Keep the removed translation in a new action"),
+          ('OBJECT', "Object", "Keep the removed translation in a new action, assigned to a new empty object that follows it")
+        ],
+        default = 'NONE'
+      )
+  bpy.types.Scene.transfer_bulk_write = bpy.props.BoolProperty \
+      (
+        name = "Bulk write keyframes",
+        description = "Sample every frame first and then write each F-Curve at once, instead of inserting the keyframes one by one",
+        default = True
+      )
+  bpy.types.Scene.transfer_curve_copy = bpy.props.BoolProperty \
+      (
+        name = "Copy F-Curves",
+        description = "Copy the keyframes of the origin bones instead of sampling every frame. Bones driven by constraints or drivers are still sampled",
+        default = False
+      )
+  bpy.types.Scene.transfer_channel_offsets = bpy.props.BoolProperty \
+      (
+        name = "Offset animation channels",
+        description = "Apply the offsets of the relations to the animation of the target bones instead of modifying their rest pose",
+        default = False
+      )
+  bpy.types.Scene.transfer_simplify = bpy.props.BoolProperty \
+      (
+        name = "Simplify keyframes",
+        description = "Remove the keyframes that can be linearly interpolated from their neighbours within a tolerance",
+        default = False
+      )
+  bpy.types.Scene.transfer_simplify_location = bpy.props.FloatProperty \
+      (
+        name = "Location tolerance",
+        description = "Maximum error of the simplified location keyframes",
+        default = 0.001, min = 0.0, precision = 4
+      )
+  bpy.types.Scene.transfer_simplify_rotation = bpy.props.FloatProperty \
+      (
+        name = "Rotation tolerance",
+        description = "Maximum error of the simplified rotation quaternion keyframes",
+        default = 0.0005, min = 0.0, precision = 4
+      )
+  bpy.types.Scene.transfer_use_frame_range = bpy.props.BoolProperty \
+      (
+        name = "Custom frame range",
+        description = "Sample the given frame range instead of the frame range of the origin animation",
+        default = False
+      )
+  bpy.types.Scene.transfer_frame_start = bpy.props.IntProperty \
+      (
+        name = "Start frame",
+        description = "First frame of the origin animation to sample",
+        default = 1
+      )
+  bpy.types.Scene.transfer_frame_end = bpy.props.IntProperty \
+      (
+        name = "End frame",
+        description = "Last frame of the origin animation to sample",
+        default = 250
+      )
+  bpy.types.Scene.transfer_frame_step = bpy.props.FloatProperty \
+      (
+        name = "Frame step",
+        description = "Number of frames between two samples of the origin animation (it may be fractional)",
+        default = 1.0, min = 0.01
+      )
+  bpy.types.Scene.transfer_time_scale = bpy.props.FloatProperty \
+      (
+        name = "Time scale",
+        description = "Factor applied to the time of the transferred keyframes (i.e. 0.25 to turn 120 fps into 30 fps with a frame step of 4)",
+        default = 1.0, min = 0.001
+      )
+  bpy.types.Scene.transfer_actions = bpy.props.EnumProperty \
+      (
+        name = "Actions",
+        description = "Actions of the origin armature that are transferred, each one to a new action of the target armature",
+        items = [
+          ('ACTIVE', "Active", "Transfer the active action"),
+          ('NLA', "NLA strips", "Transfer the actions of the NLA strips"),
+          ('ALL', "All", "Transfer every action that animates any bone of the origin armature"),
+          ('NAMES', "By name", "Transfer the actions with the given names")
+        ],
+        default = 'ACTIVE'
+      )
+  bpy.types.Scene.transfer_action_names = bpy.props.StringProperty \
+      (
+        name = "Action names",
+        description = "Comma-separated names of the actions that are transferred",
+        default = ""
+      )
+  bpy.types.Scene.transfer_incremental = bpy.props.BoolProperty \
+      (
+        name = "Incremental",
+        description = "Keep the previous transfer to the target and only rewrite the bones and frames whose origin animation or relations changed",
+        default = False
+      )
+  bpy.types.Scene.transfer_sample_window = bpy.props.IntProperty \
+      (
+        name = "Sampling window",
+        description = "Maximum number of frames whose samples are kept in memory. Longer animations are sampled into a temporary file. 0 keeps every frame in memory",
+        default = 4096,
+        min = 0
+      )
+  bpy.types.Scene.transfer_export_clip = bpy.props.BoolProperty \
+      (
+        name = "Export clip",
+        description = "Export the transferred animation of the matched bones to a binary clip file",
+        default = False
+      )
+  bpy.types.Scene.transfer_clip_path = bpy.props.StringProperty \
+      (
+        name = "Clip file",
+        description = "Clip file in which the animation is exported. When several actions are transferred, the name of each action is added to it",
+        default = "//clip.atclip",
+        subtype = 'FILE_PATH'
+      )
+  bpy.types.Scene.transfer_clip_half_location = bpy.props.BoolProperty \
+      (
+        name = "Half precision locations",
+        description = "Store the locations as 16 bit floats instead of 32 bit floats",
+        default = True
+      )
+  bpy.types.Scene.transfer_clip_quantize_rotation = bpy.props.BoolProperty \
+      (
+        name = "Quantize rotations",
+        description = "Store the rotation quaternions as 16 bit integers instead of 32 bit floats",
+        default = True
+      )
+  bpy.types.Scene.transfer_clip_relations = bpy.props.StringProperty \
+      (
+        name = "Clip relations",
+        description = "JSON file with the relations used to transfer clips. If empty, the legacy (u3d) relations are used",
+        default = "",
+        subtype = 'FILE_PATH'
+      )
+  bpy.types.Scene.transfer_profile = bpy.props.BoolProperty \
+      (
+        name = "Profile",
+        description = "Measure the time of each stage of the transfer and Make Stationary operators, and write it as a JSON report",
+        default = False
+      )
+  bpy.types.Scene.transfer_profile_cprofile = bpy.props.BoolProperty \
+      (
+        name = "Capture cProfile",
+        description = "Include the functions that took the most time (measured with cProfile) in the report",
+        default = False
+      )
+  bpy.types.Scene.transfer_profile_path = bpy.props.StringProperty \
+      (
+        name = "Report file",
+        description = "JSON file in which the report is written. If empty, the report is printed in the console",
+        default = "",
+        subtype = 'FILE_PATH'
+      )
+
+  bpy.types.Scene.transfer_interactive = bpy.props.BoolProperty \
+      (
+        name = "Interactive",
+        description = "Transfer the animation in steps, showing the progress and keeping the interface working. Press Esc to cancel the transfer",
+        default = False
+      )
+  bpy.types.WindowManager.transfer_running = bpy.props.BoolProperty \
+      (
+        name = "Transfer running",
+        description = "Whether an interactive transfer is running",
+        default = False
+      )
+  bpy.types.WindowManager.transfer_progress = bpy.props.FloatProperty \
+      (
+        name = "Transfer progress",
+        description = "Fraction of the running interactive transfer that is done",
+        default = 0.0,
+        min = 0.0,
+        max = 1.0,
+        subtype = 'FACTOR'
+      )
 
   bpy.utils.register_class(AnimationTransfer)
   bpy.utils.register_class(AnimationTransferCustom)
+  bpy.utils.register_class(AnimationTransferModal)
+  bpy.utils.register_class(AnimationTransferCustomModal)
+  bpy.utils.register_class(AnimationTransferClip)
+  bpy.utils.register_class(AnimationTransferTargets)
   bpy.utils.register_class(RemoveRootMovement)
   bpy.utils.register_class(PanelOne)
   
 
 def unregister():
   del bpy.types.Scene.root_bone_name
+  del bpy.types.Scene.root_strip_axes
+  del bpy.types.Scene.root_motion_mode
+  del bpy.types.Scene.transfer_bulk_write
+  del bpy.types.Scene.transfer_curve_copy
+  del bpy.types.Scene.transfer_channel_offsets
+  del bpy.types.Scene.transfer_simplify
+  del bpy.types.Scene.transfer_simplify_location
+  del bpy.types.Scene.transfer_simplify_rotation
+  del bpy.types.Scene.transfer_use_frame_range
+  del bpy.types.Scene.transfer_frame_start
+  del bpy.types.Scene.transfer_frame_end
+  del bpy.types.Scene.transfer_frame_step
+  del bpy.types.Scene.transfer_time_scale
+  del bpy.types.Scene.transfer_actions
+  del bpy.types.Scene.transfer_action_names
+  del bpy.types.Scene.transfer_incremental
+  del bpy.types.Scene.transfer_sample_window
+  del bpy.types.Scene.transfer_export_clip
+  del bpy.types.Scene.transfer_clip_path
+  del bpy.types.Scene.transfer_clip_half_location
+  del bpy.types.Scene.transfer_clip_quantize_rotation
+  del bpy.types.Scene.transfer_clip_relations
+  del bpy.types.Scene.transfer_profile
+  del bpy.types.Scene.transfer_profile_cprofile
+  del bpy.types.Scene.transfer_profile_path
+  del bpy.types.Scene.transfer_interactive
+  del bpy.types.WindowManager.transfer_running
+  del bpy.types.WindowManager.transfer_progress
   bpy.utils.unregister_class(PanelOne)
+  bpy.utils.unregister_class(AnimationTransferTargets)
+  bpy.utils.unregister_class(AnimationTransferClip)
+  bpy.utils.unregister_class(AnimationTransferCustomModal)
+  bpy.utils.unregister_class(AnimationTransferModal)
   bpy.utils.unregister_class(AnimationTransferCustom)
   bpy.utils.unregister_class(RemoveRootMovement)
   bpy.utils.unregister_class(AnimationTransfer)
@@ -699,3 +3903,6 @@ def unregister():
 
 if __name__ == "__main__":
   register()
+  #Arguments after '--' are not processed by Blender (blender -b --python animation_transfer.py -- <arguments>)
+  if "--" in sys.argv:
+    sys.exit(main(sys.argv[sys.argv.index("--") + 1:]))
@@ -0,0 +1,153 @@
+"""
+Runs many animation transfers in parallel, each one in its own background Blender process.
+
+  python batch_transfer.py jobs.json --blender /path/to/blender --workers 8 --report report.json
+
+The jobs file is a JSON list in which each job is a dictionary with the fields:
+ - origin: File (.blend, .fbx or .bvh) with the animated origin armature
+ - targets: File or list of files with the target armatures
+ - relations (optional): JSON file with the relations between bones. If omitted, the legacy (u3d) relations are used
+ - output_dir (optional): Directory in which the results are saved
+ - origin_armature, target_armature (optional): Names of the armature objects
+ - curve_copy, no_bulk_write, channel_offsets, keep_origin, profile, cprofile, export_clips, clip_full_precision, incremental (optional):
+   Boolean options of the transfer
+ - simplify_location, simplify_rotation (optional): Tolerances of the keyframe simplification
+ - frame_range ([start, end]), frame_step, time_scale (optional): Frames to sample and how they are written
+ - sample_window (optional): Maximum number of frames whose samples are kept in memory
+ - actions (optional): 'ACTIVE', 'NLA', 'ALL' or a list with the names of the origin actions to transfer
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "animation_transfer.py")
+
+#Options of the jobs that are passed to animation_transfer.py with a value, and as flags
+value_options = ("relations", "output_dir", "origin_armature", "target_armature", "simplify_location", "simplify_rotation",
+                 "frame_range", "frame_step", "time_scale", "actions", "sample_window")
+flag_options = ("curve_copy", "no_bulk_write", "channel_offsets", "keep_origin", "profile", "cprofile", "export_clips",
+                "clip_full_precision", "incremental")
+
+#Exit codes of the worker that mean that the transfer ran until the end (even if some target failed)
+completed_codes = (0, 1)
+
+
+def job_arguments(job, report_path):
+  """
+  Builds the arguments of animation_transfer.py for a job.
+  :param job: Dictionary describing the job (see the module documentation)
+  :param report_path: JSON file in which the worker writes its results
+  :return: List of arguments
+  """
+  targets = job["targets"]
+  if not isinstance(targets, list):
+    targets = [targets]
+
+  args = ["--origin", job["origin"], "--targets"] + targets + ["--report", report_path]
+  for key in value_options:
+    if job.get(key) is not None:
+      values = job[key] if isinstance(job[key], list) else [job[key]]
+      args += ["--" + key.replace("_", "-")] + [str(v) for v in values]
+  for key in flag_options:
+    if job.get(key, False):
+      args.append("--" + key.replace("_", "-"))
+  return args
+
+def run_job(job, blender, retries, timeout):
+  """
+  Runs a job in a background Blender process, retrying it if the process crashes or times out.
+  :param job: Dictionary describing the job (see the module documentation)
+  :param blender: Path of the Blender executable
+  :param retries: Number of times a crashed job is run again
+  :param timeout: Maximum time (in seconds) of each attempt, or None
+  :return: Dictionary with the job, its status ('FINISHED', 'FAILED' or 'CRASHED'), the number of attempts,
+    the total time, the results of each target and the warnings reported by the worker
+  """
+  result = {"job": job, "status": 'CRASHED', "attempts": 0, "time": 0.0, "targets": [], "warnings": [], "log": ""}
+  start = time.perf_counter()
+
+  fd, report_path = tempfile.mkstemp(suffix=".json")
+  os.close(fd)
+  try:
+    while result["attempts"] <= retries:
+      result["attempts"] += 1
+      if os.path.exists(report_path):
+        os.remove(report_path)
+
+      command = [blender, "-b", "--factory-startup", "--python", script_path, "--"] + job_arguments(job, report_path)
+      try:
+        process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=timeout,
+                                 universal_newlines=True)
+      except subprocess.TimeoutExpired:
+        result["log"] = "Timed out after " + str(timeout) + " seconds"
+        continue
+
+      result["log"] = process.stdout[-4000:]
+      if process.returncode not in completed_codes or not os.path.exists(report_path):
+        continue
+
+      with open(report_path, 'r') as f:
+        result["targets"] = json.load(f)
+      result["warnings"] = [msg for t in result["targets"] for level, msg in t["messages"] if level == 'WARNING']
+      result["status"] = 'FINISHED' if process.returncode == 0 else 'FAILED'
+      break
+  finally:
+    if os.path.exists(report_path):
+      os.remove(report_path)
+
+  result["time"] = time.perf_counter() - start
+  return result
+
+def run_jobs(jobs, blender, workers, retries=1, timeout=None):
+  """
+  Runs several jobs in a pool of background Blender processes.
+  :param jobs: List of dictionaries describing the jobs (see the module documentation)
+  :param blender: Path of the Blender executable
+  :param workers: Number of Blender processes running at the same time
+  :param retries: Number of times a crashed job is run again
+  :param timeout: Maximum time (in seconds) of each attempt, or None
+  :return: List with the result of each job (see run_job), in the same order as the jobs
+  """
+  results = [None] * len(jobs)
+  #Every worker is a separate process, so threads are enough to wait for them
+  with ThreadPoolExecutor(max_workers=workers) as pool:
+    futures = {pool.submit(run_job, job, blender, retries, timeout): i for i, job in enumerate(jobs)}
+    for done, future in enumerate(as_completed(futures)):
+      i = futures[future]
+      results[i] = future.result()
+      print("[" + str(done + 1) + "/" + str(len(jobs)) + "] " + results[i]["status"] + " " + jobs[i]["origin"] +
+            " (" + "{:.1f}".format(results[i]["time"]) + " s, " + str(results[i]["attempts"]) + " attempts)")
+  return results
+
+def main(argv):
+  parser = argparse.ArgumentParser(description="Runs many animation transfers in parallel background Blender processes.")
+  parser.add_argument("jobs", help="JSON file with the list of jobs")
+  parser.add_argument("--blender", default="blender", help="Path of the Blender executable")
+  parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of Blender processes running at the same time")
+  parser.add_argument("--retries", type=int, default=1, help="Number of times a crashed job is run again")
+  parser.add_argument("--timeout", type=float, help="Maximum time (in seconds) of each attempt")
+  parser.add_argument("--report", help="JSON file in which the results of all the jobs are written")
+  args = parser.parse_args(argv)
+
+  with open(args.jobs, 'r') as f:
+    jobs = json.load(f)
+
+  results = run_jobs(jobs, args.blender, args.workers, args.retries, args.timeout)
+
+  if args.report is not None:
+    with open(args.report, 'w') as f:
+      json.dump(results, f, indent=2)
+
+  failed = [r for r in results if r["status"] != 'FINISHED']
+  print("Finished " + str(len(results) - len(failed)) + " of " + str(len(results)) + " jobs.")
+  return 0 if len(failed) == 0 else 1
+
+
+if __name__ == "__main__":
+  sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,266 @@
+"""
+Benchmarks the animation transfer with synthetic armatures and actions of several sizes.
+
+In background Blender:
+  blender -b --factory-startup --python benchmarks/benchmark.py -- --bones 100 500 --frames 250 1000 --output results.json
+Without Blender, with the lightweight bpy/mathutils stand-in of benchmarks/standin:
+  python benchmarks/benchmark.py --bones 100 500 --frames 250 1000 --output results.json
+
+For every naming scheme, number of bones and number of frames it measures:
+ - matching: Matching the bones of both armatures with the relations
+ - offsets: Applying the offsets of the relations to the rest pose of the target armature
+ - transfer: The whole transfer, for each of the selected transfer modes
+ - make_stationary: Removing the translation of the root bone of the transferred action
+Each measure is repeated and the minimum and median times are reported. Results of different runs (with the same
+backend) can be compared with --compare.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import statistics
+
+benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(benchmarks_dir))
+try:
+  import bpy
+except ImportError:
+  sys.path.insert(0, os.path.join(benchmarks_dir, "standin"))
+  import bpy
+
+import mathutils
+import numpy as np
+
+import animation_transfer as at
+
+#Transfer modes that can be measured, as keyword arguments of TransferOptions
+transfer_modes = {
+  "bulk": {},
+  "insert": {"bulk_write": False},
+  "curve_copy": {"curve_copy": True},
+  "channel_offsets": {"channel_offsets": True},
+  "simplify": {"simplify": {"location": 0.001, "rotation_quaternion": 0.0005}},
+}
+
+#Prefixes of the bone names of the origin and target armatures in each naming scheme
+schemes = {
+  "u3d": ("", ""),
+  "prefixed": ("mixamorig:", "Armature_"),
+}
+
+
+class QuietTransfer(at.HeadlessTransfer):
+  """
+  Headless transfer that keeps the messages without printing them, so they don't add to the measured time.
+  """
+  def report(self, level, message):
+    self.messages.append((next(iter(level)), message))
+
+
+def synthetic_names(n_bones):
+  """
+  Builds the names of the bones of a synthetic armature, in the u3d format (see bone_names and finger_names).
+  Armatures with more bones than the u3d skeleton get extra bones named extra_<i>.
+  :param n_bones: Number of bones
+  :return: List of names
+  """
+  names = at.bone_names + [f + p for f in at.finger_names for p in at.finger_part_names]
+  names += ["extra_" + str(i) for i in range(max(0, n_bones - len(names)))]
+  return names[0:n_bones]
+
+def synthetic_relations(names, offset_ratio, rng):
+  """
+  Builds a relation for each bone name, with the same name in both armatures.
+  :param names: Bone names (as returned by synthetic_names)
+  :param offset_ratio: Fraction of the relations that have an offset
+  :param rng: random.Random instance
+  :return: List of Relation instances
+  """
+  relations = []
+  for name in names:
+    offset = None
+    if rng.random() < offset_ratio:
+      rotation = at.MyEuler([rng.uniform(-0.5, 0.5) for _ in range(3)], 'XYZ').to_matrix().to_3x3()
+      offset = at.Transformation(rotation, mathutils.Vector([rng.uniform(-0.01, 0.01) for _ in range(3)]))
+    relations.append(at.Relation(name, name, offset))
+  return relations
+
+def create_armature(name, bone_names, prefix, rng):
+  """
+  Creates an armature object in which every bone is the child of a previous one.
+  :param name: Name of the object
+  :param bone_names: Names of the bones (without the prefix)
+  :param prefix: Prefix of the names of the bones
+  :param rng: random.Random instance
+  :return: The armature object
+  """
+  armature = bpy.data.armatures.new(name)
+  obj = bpy.data.objects.new(name, armature)
+  bpy.context.scene.collection.objects.link(obj)
+  bpy.context.view_layer.objects.active = obj
+
+  bpy.ops.object.mode_set(mode='EDIT')
+  edit_bones = []
+  for i, bone_name in enumerate(bone_names):
+    edit_bone = armature.edit_bones.new(prefix + bone_name)
+    edit_bone.head = (rng.uniform(-1, 1), rng.uniform(-1, 1), rng.uniform(0, 2))
+    edit_bone.tail = (edit_bone.head[0], edit_bone.head[1], edit_bone.head[2] + 0.1)
+    if i > 0:
+      edit_bone.parent = edit_bones[rng.randrange(max(1, i // 2), i) if i > 1 else 0]
+    edit_bones.append(edit_bone)
+  bpy.ops.object.mode_set(mode='OBJECT')
+  return obj
+
+def create_action(obj, n_frames, rng):
+  """
+  Creates an action with a smooth random animation of the location and rotation of every bone of an armature.
+  :param obj: Armature object, which gets the action as its active action
+  :param n_frames: Number of frames (and keyframes) of the action
+  :param rng: random.Random instance
+  :return: The action
+  """
+  action = at.create_action(obj, obj.name + "Action")
+  frames = np.arange(1, n_frames + 1, dtype=float)
+  for bone in obj.pose.bones:
+    phase, speed = rng.uniform(0, 6.3), rng.uniform(0.01, 0.1)
+    location = 0.1 * np.stack([np.sin(speed * frames + phase + k) for k in range(3)], axis=1)
+    angles = 0.3 * np.sin(speed * frames + phase)
+    rotation = np.stack([np.cos(angles / 2), np.sin(angles / 2), np.zeros(n_frames), np.zeros(n_frames)], axis=1)
+    at.write_bone_channel(action, bone.name, "location", frames, location)
+    at.write_bone_channel(action, bone.name, "rotation_quaternion", frames, rotation)
+  return action
+
+def measure(function, repeat, setup=None):
+  """
+  Runs a function several times, measuring each run.
+  :param function: Function to measure. It receives the result of setup.
+  :param repeat: Number of runs
+  :param setup: Function called before each run, whose time is not measured. If None, the function receives None.
+  :return: List with the time (in seconds) of each run
+  """
+  times = []
+  for _ in range(repeat):
+    arg = setup() if setup is not None else None
+    start = time.perf_counter()
+    function(arg)
+    times.append(time.perf_counter() - start)
+  return times
+
+def run_case(scheme, n_bones, n_frames, modes, repeat, offset_ratio, seed):
+  """
+  Measures all the stages for an armature size and animation length.
+  :return: List of dictionaries with the case, the stage and its times
+  """
+  rng = random.Random(seed)
+  origin_prefix, target_prefix = schemes[scheme]
+  names = synthetic_names(n_bones)
+  relations = synthetic_relations(names, offset_ratio, rng)
+
+  bpy.ops.wm.read_factory_settings(use_empty=True)
+  origin = create_armature("Origin", names, origin_prefix, rng)
+  create_action(origin, n_frames, rng)
+
+  case = {"scheme": scheme, "bones": n_bones, "frames": n_frames}
+  results = []
+  def add(stage, times):
+    results.append(dict(case, stage=stage, times=times, min=min(times), median=statistics.median(times)))
+
+  transfer = QuietTransfer()
+  transfer._relations = relations
+  origin_names = origin.data.bones.keys()
+
+  targets = []
+  def new_target():
+    #The previous target is removed, so it is not evaluated with the rest of the scene
+    for obj in targets:
+      bpy.data.objects.remove(obj, do_unlink=True)
+    targets[:] = [create_armature("Target", names, target_prefix, random.Random(seed))]
+    return targets[0]
+
+  target = new_target()
+  target_names = target.data.bones.keys()
+  add("matching", measure(lambda _: transfer.get_matches(relations, origin_names, target_names), repeat))
+  matches = transfer.get_matches(relations, origin_names, target_names)
+
+  def offsets(target):
+    at.apply_offsets(target, [(target_names[t_idx], relations[r_idx].get_offset()) for r_idx, _, t_idx in matches])
+  add("offsets", measure(offsets, repeat, new_target))
+
+  for mode in modes:
+    options = at.TransferOptions(**transfer_modes[mode])
+    add("transfer_" + mode, measure(lambda target: transfer.transfer_objects(origin, target, options), repeat, new_target))
+
+  def transferred_target():
+    target = new_target()
+    transfer.transfer_objects(origin, target, at.TransferOptions())
+    return target
+  def make_stationary(target):
+    at.remove_root_motion(target, target.animation_data.action, target.pose.bones[0])
+  add("make_stationary", measure(make_stationary, repeat, transferred_target))
+
+  return results
+
+def environment():
+  """
+  :return: Dictionary describing the machine and the backend, to tell which results are comparable
+  """
+  standin = getattr(bpy.app, "version_string", "") == "stand-in"
+  return {"backend": "stand-in" if standin else "blender " + bpy.app.version_string,
+          "python": platform.python_version(), "numpy": np.__version__,
+          "machine": platform.machine(), "system": platform.system(), "processor": platform.processor()}
+
+def compare(results, baseline):
+  """
+  Prints the ratio between the median times of two runs, for the measures that are in both.
+  """
+  key = lambda r: (r["scheme"], r["bones"], r["frames"], r["stage"])
+  previous = {key(r): r for r in baseline["results"]}
+  if baseline["environment"]["backend"] != environment()["backend"]:
+    print("Warning: the baseline was measured with another backend (" + baseline["environment"]["backend"] + ")")
+  print("\n{:<10} {:>6} {:>7} {:<24} {:>10} {:>10} {:>8}".format("scheme", "bones", "frames", "stage", "baseline", "median", "ratio"))
+  for r in results:
+    p = previous.get(key(r))
+    if p is not None:
+      print("{:<10} {:>6} {:>7} {:<24} {:>10.4f} {:>10.4f} {:>8.2f}".format(
+        r["scheme"], r["bones"], r["frames"], r["stage"], p["median"], r["median"], r["median"] / max(p["median"], 1e-12)))
+
+def main(argv):
+  parser = argparse.ArgumentParser(description="Benchmarks the animation transfer with synthetic armatures and actions.")
+  parser.add_argument("--bones", type=int, nargs='+', default=[88, 500], help="Numbers of bones of the armatures")
+  parser.add_argument("--frames", type=int, nargs='+', default=[250, 1000], help="Numbers of frames of the actions")
+  parser.add_argument("--schemes", nargs='+', default=list(schemes), choices=list(schemes), help="Naming schemes of the bones")
+  parser.add_argument("--modes", nargs='+', default=["bulk"], choices=list(transfer_modes), help="Transfer modes to measure")
+  parser.add_argument("--repeat", type=int, default=3, help="Number of runs of each measure")
+  parser.add_argument("--offset-ratio", type=float, default=0.5, help="Fraction of the relations that have an offset")
+  parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic armatures and actions")
+  parser.add_argument("--output", help="JSON file in which the results are written")
+  parser.add_argument("--compare", help="JSON file with the results of a previous run to compare with")
+  args = parser.parse_args(argv)
+
+  results = []
+  for scheme in args.schemes:
+    for n_bones in args.bones:
+      for n_frames in args.frames:
+        for r in run_case(scheme, n_bones, n_frames, args.modes, args.repeat, args.offset_ratio, args.seed):
+          print("{:<10} {:>6} bones {:>7} frames  {:<24} min {:.4f} s  median {:.4f} s".format(
+            r["scheme"], r["bones"], r["frames"], r["stage"], r["min"], r["median"]))
+          results.append(r)
+
+  report = {"environment": environment(), "arguments": vars(args), "results": results}
+  if args.output is not None:
+    with open(args.output, 'w') as f:
+      json.dump(report, f, indent=2)
+  if args.compare is not None:
+    with open(args.compare, 'r') as f:
+      compare(results, json.load(f))
+  return 0
+
+
+if __name__ == "__main__":
+  #Arguments after '--' are not processed by Blender (blender -b --python benchmark.py -- <arguments>)
+  argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+  sys.exit(main(argv))
@@ -0,0 +1,702 @@
+"""
+Lightweight stand-in of Blender's bpy module, with the subset of the API used by animation_transfer.py and the benchmarks.
+Armatures have no real rigging: pose channels are stored in NumPy arrays and F-Curves are always interpolated linearly,
+so the timings measure the work done by the add-on, not the one done by Blender. It is only meant to run the benchmarks
+on machines without Blender (i.e. CI), never to check results.
+"""
+
+import re
+import sys
+import types as _types
+from collections import OrderedDict
+
+import numpy as np
+
+import mathutils
+
+
+# -----------------------------------------
+# Registration API (only needs to be importable)
+
+class _Registrable():
+  pass
+
+types = _types.SimpleNamespace(Panel=_Registrable, Operator=_Registrable, Menu=_Registrable,
+                               Scene=type("Scene", (), {}))
+
+def _property(**kwargs):
+  return None
+
+props = _types.SimpleNamespace(StringProperty=_property, BoolProperty=_property, FloatProperty=_property,
+                               IntProperty=_property, EnumProperty=_property, BoolVectorProperty=_property,
+                               FloatVectorProperty=_property)
+sys.modules[__name__ + ".props"] = props
+
+def _escape_identifier(name):
+  return name.replace('\\', '\\\\').replace('"', '\\"')
+
+utils = _types.SimpleNamespace(escape_identifier=_escape_identifier, register_class=lambda cls: None,
+                               unregister_class=lambda cls: None)
+path = _types.SimpleNamespace(abspath=lambda p: p, clean_name=lambda name: re.sub(r'[^\w.-]', '_', name))
+
+
+# -----------------------------------------
+# Collections
+
+class _Collection():
+  """
+  Ordered collection of named items, accessed by index or by name.
+  """
+  def __init__(self, items=()):
+    self._items = OrderedDict((item.name, item) for item in items)
+
+  def __len__(self):
+    return len(self._items)
+
+  def __iter__(self):
+    return iter(list(self._items.values()))
+
+  def __contains__(self, key):
+    if isinstance(key, str):
+      return key in self._items
+    return any(item is key for item in self._items.values())
+
+  def __getitem__(self, key):
+    if isinstance(key, int):
+      return list(self._items.values())[key]
+    return self._items[key]
+
+  def get(self, name, default=None):
+    return self._items.get(name, default)
+
+  def keys(self):
+    return list(self._items.keys())
+
+  def values(self):
+    return list(self._items.values())
+
+  def _unique_name(self, name):
+    if name not in self._items:
+      return name
+    i = 1
+    while "%s.%03d" % (name, i) in self._items:
+      i += 1
+    return "%s.%03d" % (name, i)
+
+  def _add(self, item):
+    item.name = self._unique_name(item.name)
+    self._items[item.name] = item
+    return item
+
+  def _remove(self, item):
+    self._items.pop(item.name, None)
+
+
+class _ID():
+  def __init__(self, name):
+    self.name = name
+    self.use_fake_user = False
+    self._properties = {}
+
+  def as_pointer(self):
+    return id(self)
+
+  #Custom properties
+  def __getitem__(self, key):
+    return self._properties[key]
+
+  def __setitem__(self, key, value):
+    self._properties[key] = value
+
+  def __contains__(self, key):
+    return key in self._properties
+
+  def get(self, key, default=None):
+    return self._properties.get(key, default)
+
+  def keys(self):
+    return list(self._properties.keys())
+
+
+# -----------------------------------------
+# Animation
+
+#Items of the enum properties of the keyframes, in the order of their values in Blender
+_keyframe_enums = {
+  "interpolation": ['CONSTANT', 'LINEAR', 'BEZIER', 'BACK', 'BOUNCE', 'CIRC', 'CUBIC', 'ELASTIC', 'EXPO', 'QUAD', 'QUART',
+                    'QUINT', 'SINE'],
+  "easing": ['AUTO', 'EASE_IN', 'EASE_OUT', 'EASE_IN_OUT'],
+  "handle_left_type": ['FREE', 'AUTO', 'VECTOR', 'ALIGNED', 'AUTO_CLAMPED'],
+  "handle_right_type": ['FREE', 'AUTO', 'VECTOR', 'ALIGNED', 'AUTO_CLAMPED'],
+}
+
+def _enum_rna(enums):
+  properties = {}
+  for name, items in enums.items():
+    enum_items = {identifier: _types.SimpleNamespace(identifier=identifier, value=value) for value, identifier in enumerate(items)}
+    properties[name] = _types.SimpleNamespace(enum_items=enum_items)
+  return _types.SimpleNamespace(properties=properties)
+
+class Keyframe():
+  bl_rna = _enum_rna(_keyframe_enums)
+
+  def __init__(self, points, i):
+    self._points = points
+    self._i = i
+
+  def _get(attr):
+    return property(lambda self: getattr(self._points, "_" + attr)[self._i],
+                    lambda self, value: getattr(self._points, "_" + attr).__setitem__(self._i, value))
+
+  interpolation = _get("interpolation")
+  easing = _get("easing")
+  handle_left_type = _get("handle_left_type")
+  handle_right_type = _get("handle_right_type")
+  del _get
+
+  @property
+  def co(self):
+    return mathutils.Vector(self._points._co[self._i])
+
+  @co.setter
+  def co(self, value):
+    self._points._co[self._i] = value[0:2]
+    self._points._fcurve._touch()
+
+
+types.Keyframe = Keyframe
+
+
+class KeyframePoints():
+  def __init__(self, fcurve):
+    self._fcurve = fcurve
+    self._co = np.empty((0, 2))
+    self._handle_left = np.empty((0, 2))
+    self._handle_right = np.empty((0, 2))
+    self._interpolation = []
+    self._easing = []
+    self._handle_left_type = []
+    self._handle_right_type = []
+
+  def __len__(self):
+    return len(self._co)
+
+  def __getitem__(self, i):
+    if i < 0:
+      i += len(self)
+    return Keyframe(self, i)
+
+  def __iter__(self):
+    return (Keyframe(self, i) for i in range(len(self)))
+
+  def add(self, count):
+    zeros = np.zeros((count, 2))
+    self._co = np.concatenate([self._co, zeros])
+    self._handle_left = np.concatenate([self._handle_left, zeros])
+    self._handle_right = np.concatenate([self._handle_right, zeros])
+    self._interpolation += ['BEZIER'] * count
+    self._easing += ['AUTO'] * count
+    self._handle_left_type += ['AUTO_CLAMPED'] * count
+    self._handle_right_type += ['AUTO_CLAMPED'] * count
+    self._fcurve._touch()
+
+  def insert(self, frame, value):
+    frames = self._co[:, 0]
+    i = np.searchsorted(frames, frame)
+    if i < len(frames) and frames[i] == frame:
+      self._co[i, 1] = value
+    else:
+      self._co = np.insert(self._co, i, (frame, value), axis=0)
+      self._handle_left = np.insert(self._handle_left, i, (frame, value), axis=0)
+      self._handle_right = np.insert(self._handle_right, i, (frame, value), axis=0)
+      self._interpolation.insert(i, 'BEZIER')
+      self._easing.insert(i, 'AUTO')
+      self._handle_left_type.insert(i, 'AUTO_CLAMPED')
+      self._handle_right_type.insert(i, 'AUTO_CLAMPED')
+    self._fcurve._touch()
+    return Keyframe(self, i)
+
+  def foreach_get(self, attr, buffer):
+    if attr in _keyframe_enums:
+      #Enum properties are read as the values of their items
+      buffer[:] = [_keyframe_enums[attr].index(item) for item in getattr(self, "_" + attr)]
+      return
+    buffer[:] = getattr(self, "_" + attr).ravel()
+
+  def foreach_set(self, attr, buffer):
+    if attr in _keyframe_enums:
+      setattr(self, "_" + attr, [_keyframe_enums[attr][int(v)] for v in buffer])
+      self._fcurve._touch()
+      return
+    array = getattr(self, "_" + attr)
+    array[:] = np.asarray(buffer, dtype=float).reshape(array.shape)
+    self._fcurve._touch()
+
+
+class FCurve():
+  def __init__(self, action, data_path, index, group):
+    self.id_data = action
+    self.data_path = data_path
+    self.array_index = index
+    self.group = group
+    self.extrapolation = 'CONSTANT'
+    self.modifiers = []
+    self.keyframe_points = KeyframePoints(self)
+
+  def _touch(self):
+    self.id_data._version += 1
+
+  def update(self):
+    points = self.keyframe_points
+    order = np.argsort(points._co[:, 0], kind='stable')
+    if np.any(order != np.arange(len(order))):
+      for attr in ('_co', '_handle_left', '_handle_right'):
+        setattr(points, attr, getattr(points, attr)[order])
+      for attr in ('_interpolation', '_easing', '_handle_left_type', '_handle_right_type'):
+        setattr(points, attr, [getattr(points, attr)[i] for i in order])
+    #Automatic handles are recalculated, flat (as clamped handles are at extremes), a third of the way to the neighbours
+    frames = points._co[:, 0]
+    gaps = np.diff(frames, prepend=frames[:1] - 1, append=frames[-1:] + 1) / 3 if len(frames) > 0 else np.empty(0)
+    for attr, types, side in (('_handle_left', points._handle_left_type, -1), ('_handle_right', points._handle_right_type, 1)):
+      auto = np.array([t in ('AUTO', 'AUTO_CLAMPED') for t in types], dtype=bool)
+      handles = getattr(points, attr)
+      handles[auto, 0] = frames[auto] + side * (gaps[:-1] if side < 0 else gaps[1:])[auto]
+      handles[auto, 1] = points._co[auto, 1]
+    self._touch()
+
+  def evaluate(self, frame):
+    co = self.keyframe_points._co
+    if len(co) == 0:
+      return 0.0
+    return float(np.interp(frame, co[:, 0], co[:, 1]))
+
+
+class ActionGroup():
+  def __init__(self, name):
+    self.name = name
+
+
+class ActionFCurves():
+  def __init__(self, action):
+    self._action = action
+    self._curves = OrderedDict()
+    self._groups = {}
+
+  def __len__(self):
+    return len(self._curves)
+
+  def __iter__(self):
+    return iter(list(self._curves.values()))
+
+  def find(self, data_path, index=0):
+    return self._curves.get((data_path, index))
+
+  def new(self, data_path, index=0, action_group=""):
+    if (data_path, index) in self._curves:
+      raise RuntimeError("F-Curve '" + data_path + "[" + str(index) + "]' already exists in action '" + self._action.name + "'")
+    group = None
+    if action_group:
+      group = self._groups.setdefault(action_group, ActionGroup(action_group))
+    fcurve = FCurve(self._action, data_path, index, group)
+    self._curves[(data_path, index)] = fcurve
+    self._action._version += 1
+    return fcurve
+
+  def remove(self, fcurve):
+    del self._curves[(fcurve.data_path, fcurve.array_index)]
+    self._action._version += 1
+
+
+class Action(_ID):
+  def __init__(self, name):
+    super().__init__(name)
+    self.id_root = 'OBJECT'
+    self._version = 0
+    self.fcurves = ActionFCurves(self)
+
+  @property
+  def frame_range(self):
+    frames = [fc.keyframe_points._co[:, 0] for fc in self.fcurves if len(fc.keyframe_points) > 0]
+    if len(frames) == 0:
+      return (0.0, 0.0)
+    frames = np.concatenate(frames)
+    return (float(frames.min()), float(frames.max()))
+
+
+class AnimData():
+  def __init__(self):
+    self.action = None
+    self.use_nla = True
+    self.use_tweak_mode = False
+    self.nla_tracks = []
+    self.drivers = []
+
+
+# -----------------------------------------
+# Armatures
+
+class Bone():
+  def __init__(self, name, matrix_local, parent=None, use_connect=False):
+    self.name = name
+    self.matrix_local = matrix_local
+    self.parent = parent
+    self.use_connect = use_connect
+
+
+class EditBone():
+  def __init__(self, armature, name):
+    self._armature = armature
+    self.name = name
+    self.parent = None
+    self.use_connect = False
+    self.matrix = mathutils.Matrix.Identity(4)
+    self.tail = mathutils.Vector((0.0, 1.0, 0.0))
+
+  @property
+  def head(self):
+    return self.matrix.to_translation()
+
+  @head.setter
+  def head(self, value):
+    m = np.array(self.matrix)
+    m[0:3, 3] = list(value)
+    self.matrix = mathutils.Matrix(m)
+
+  @property
+  def children(self):
+    return [b for b in self._armature.edit_bones if b.parent is self]
+
+
+class EditBones(_Collection):
+  def __init__(self, armature, bones):
+    super().__init__()
+    self._armature = armature
+    for bone in bones:
+      edit_bone = self.new(bone.name)
+      edit_bone.matrix = bone.matrix_local.copy()
+      edit_bone.use_connect = bone.use_connect
+    for bone in bones:
+      if bone.parent is not None:
+        self[bone.name].parent = self[bone.parent.name]
+
+  def new(self, name):
+    return self._add(EditBone(self._armature, name))
+
+
+class Armature(_ID):
+  def __init__(self, name):
+    super().__init__(name)
+    self.bones = _Collection()
+    self.edit_bones = None
+    self.pose_position = 'POSE'
+
+  def _edit(self):
+    self.edit_bones = EditBones(self, self.bones)
+
+  def _apply_edit(self):
+    bones = []
+    for edit_bone in self.edit_bones:
+      bones.append(Bone(edit_bone.name, edit_bone.matrix.copy(), use_connect=edit_bone.use_connect))
+    self.bones = _Collection(bones)
+    for edit_bone in self.edit_bones:
+      if edit_bone.parent is not None:
+        self.bones[edit_bone.name].parent = self.bones[edit_bone.parent.name]
+    self.edit_bones = None
+
+
+#Channels of the pose bones and their rest value
+pose_channels = OrderedDict([('location', (0.0, 0.0, 0.0)), ('rotation_quaternion', (1.0, 0.0, 0.0, 0.0)),
+                             ('rotation_axis_angle', (0.0, 0.0, 1.0, 0.0)), ('rotation_euler', (0.0, 0.0, 0.0)),
+                             ('scale', (1.0, 1.0, 1.0))])
+
+
+class PoseBone():
+  def __init__(self, obj, name, index):
+    self.id_data = obj
+    self.name = name
+    self._index = index
+    self.constraints = []
+    self.rotation_mode = 'QUATERNION'
+
+  def _channel(name):
+    return property(lambda self: self.id_data.pose._channels[name][self._index],
+                    lambda self, value: self.id_data.pose._channels[name].__setitem__(self._index, list(value)))
+
+  location = _channel('location')
+  rotation_quaternion = _channel('rotation_quaternion')
+  rotation_axis_angle = _channel('rotation_axis_angle')
+  rotation_euler = _channel('rotation_euler')
+  scale = _channel('scale')
+  del _channel
+
+  def keyframe_insert(self, data_path, frame=None, group=None):
+    obj = self.id_data
+    if obj.animation_data is None:
+      obj.animation_data_create()
+    if obj.animation_data.action is None:
+      obj.animation_data.action = data.actions.new(obj.name + "Action")
+    action = obj.animation_data.action
+    full_path = 'pose.bones["' + _escape_identifier(self.name) + '"].' + data_path
+    if frame is None:
+      frame = context.scene.frame_current
+    for i, value in enumerate(getattr(self, data_path)):
+      fcurve = action.fcurves.find(full_path, index=i)
+      if fcurve is None:
+        fcurve = action.fcurves.new(full_path, index=i, action_group=group or self.name)
+      fcurve.keyframe_points.insert(frame, value)
+    return True
+
+
+class PoseBones(_Collection):
+  def __init__(self, pose):
+    super().__init__()
+    self._pose = pose
+
+  def foreach_get(self, attr, buffer):
+    buffer[:] = self._pose._channels[attr].ravel()
+
+  def foreach_set(self, attr, buffer):
+    array = self._pose._channels[attr]
+    array[:] = np.asarray(buffer, dtype=float).reshape(array.shape)
+
+
+class Pose():
+  def __init__(self, obj):
+    self._obj = obj
+    self.bones = PoseBones(self)
+    self._channels = {name: np.empty((0, len(rest))) for name, rest in pose_channels.items()}
+
+  def _rebuild(self):
+    """
+    Creates the pose bones of the bones of the armature, keeping the channels of the bones that already existed.
+    """
+    old = {b.name: b._index for b in self.bones}
+    names = self._obj.data.bones.keys()
+    channels = {}
+    for name, rest in pose_channels.items():
+      array = np.tile(np.array(rest), (len(names), 1))
+      for i, bone_name in enumerate(names):
+        if bone_name in old:
+          array[i] = self._channels[name][old[bone_name]]
+      channels[name] = array
+    self._channels = channels
+    self.bones = PoseBones(self)
+    for i, bone_name in enumerate(names):
+      self.bones._add(PoseBone(self._obj, bone_name, i))
+
+
+# -----------------------------------------
+# Objects and scene
+
+class Modifier():
+  def __init__(self, name, type, object=None):
+    self.name = name
+    self.type = type
+    self.object = object
+    self.show_viewport = True
+
+
+class Object(_ID):
+  def __init__(self, name, object_data):
+    super().__init__(name)
+    self.data = object_data
+    self.type = 'EMPTY' if object_data is None else 'ARMATURE' if isinstance(object_data, Armature) else 'MESH'
+    self.animation_data = None
+    self.parent = None
+    self.matrix_parent_inverse = mathutils.Matrix.Identity(4)
+    self.modifiers = []
+    self.constraints = []
+    self.hide_viewport = False
+    self.library = None
+    self.users_collection = []
+    self.pose = None
+    if self.type == 'ARMATURE':
+      self.pose = Pose(self)
+      self.pose._rebuild()
+
+  @property
+  def children(self):
+    return [obj for obj in data.objects if obj.parent is self]
+
+  def animation_data_create(self):
+    if self.animation_data is None:
+      self.animation_data = AnimData()
+    return self.animation_data
+
+  def animation_data_clear(self):
+    self.animation_data = None
+
+  def select_set(self, state):
+    pass
+
+
+class Objects(_Collection):
+  def new(self, name, object_data):
+    return self._add(Object(name, object_data))
+
+  def remove(self, obj, do_unlink=True):
+    for collection in obj.users_collection:
+      collection.objects._remove(obj)
+    self._remove(obj)
+
+
+class Actions(_Collection):
+  def new(self, name):
+    return self._add(Action(name))
+
+  def remove(self, action):
+    self._remove(action)
+
+
+class Armatures(_Collection):
+  def new(self, name):
+    return self._add(Armature(name))
+
+
+class CollectionObjects(_Collection):
+  def __init__(self, collection):
+    super().__init__()
+    self._collection = collection
+
+  def link(self, obj):
+    self._items[obj.name] = obj
+    obj.users_collection.append(self._collection)
+
+
+class SceneCollection():
+  def __init__(self):
+    self.name = "Scene Collection"
+    self.objects = CollectionObjects(self)
+
+
+class _Evaluator():
+  """
+  Evaluates the pose bone F-Curves of an action on an armature. The F-Curves that share the same keyframe frames
+  are interpolated together.
+  """
+  data_path_re = re.compile(r'^pose\.bones\["((?:[^"\\]|\\.)*)"\]\.(\w+)$')
+
+  def __init__(self, obj, action):
+    self.key = (action._version, obj.pose.bones.keys())
+    groups = {}
+    pose_bones = obj.pose.bones
+    for fcurve in action.fcurves:
+      m = self.data_path_re.match(fcurve.data_path)
+      co = fcurve.keyframe_points._co
+      if m is None or len(co) == 0 or m.group(2) not in pose_channels:
+        continue
+      bone = pose_bones.get(m.group(1).replace('\\"', '"').replace('\\\\', '\\'))
+      if bone is None:
+        continue
+      group = groups.setdefault(co[:, 0].tobytes(), (co[:, 0].copy(), [], []))
+      group[1].append((m.group(2), bone._index, fcurve.array_index))
+      group[2].append(co[:, 1])
+    self.groups = []
+    for frames, targets, values in groups.values():
+      #Indices of the targets of each channel, so they are all written at once
+      writes = []
+      for channel in pose_channels:
+        rows = [r for r, t in enumerate(targets) if t[0] == channel]
+        if len(rows) > 0:
+          writes.append((channel, np.array(rows), np.array([targets[r][1] for r in rows]), np.array([targets[r][2] for r in rows])))
+      self.groups.append((frames, writes, np.array(values)))
+
+  def evaluate(self, obj, frame):
+    channels = obj.pose._channels
+    for frames, writes, values in self.groups:
+      i = int(np.clip(np.searchsorted(frames, frame, side='right') - 1, 0, len(frames) - 1))
+      j = min(i + 1, len(frames) - 1)
+      w = 0.0 if j == i else min(max((frame - frames[i]) / (frames[j] - frames[i]), 0.0), 1.0)
+      result = values[:, i] * (1 - w) + values[:, j] * w
+      for channel, rows, bones, indices in writes:
+        channels[channel][bones, indices] = result[rows]
+
+
+class Scene():
+  def __init__(self):
+    self.name = "Scene"
+    self.collection = SceneCollection()
+    self.frame_current = 1
+    self.frame_start = 1
+    self.frame_end = 250
+    self.render = _types.SimpleNamespace(fps=24, fps_base=1.0)
+    self._evaluators = {}
+
+  def frame_set(self, frame, subframe=0.0):
+    self.frame_current = int(frame)
+    t = frame + subframe
+    for obj in self.collection.objects:
+      if obj.type != 'ARMATURE' or obj.animation_data is None or obj.animation_data.action is None:
+        continue
+      action = obj.animation_data.action
+      evaluator = self._evaluators.get((obj.as_pointer(), action.as_pointer()))
+      if evaluator is None or evaluator.key != (action._version, obj.pose.bones.keys()):
+        evaluator = _Evaluator(obj, action)
+        self._evaluators[(obj.as_pointer(), action.as_pointer())] = evaluator
+      evaluator.evaluate(obj, t)
+
+
+class LayerObjects():
+  def __init__(self):
+    self.active = None
+
+
+class ViewLayer():
+  def __init__(self):
+    self.objects = LayerObjects()
+
+  def update(self):
+    pass
+
+
+class Context():
+  def __init__(self):
+    self.scene = Scene()
+    self.view_layer = ViewLayer()
+    self.mode = 'OBJECT'
+
+  @property
+  def active_object(self):
+    return self.view_layer.objects.active
+
+  @property
+  def object(self):
+    return self.view_layer.objects.active
+
+  @property
+  def selected_objects(self):
+    return [obj for obj in self.scene.collection.objects if getattr(obj, "_selected", False)]
+
+
+def _mode_set(mode='OBJECT'):
+  obj = context.view_layer.objects.active
+  if obj is None or obj.type != 'ARMATURE':
+    raise RuntimeError("Operator bpy.ops.object.mode_set.poll() failed, context is incorrect")
+  if mode == 'EDIT' and context.mode != 'EDIT':
+    obj.data._edit()
+  elif mode != 'EDIT' and context.mode == 'EDIT':
+    obj.data._apply_edit()
+    obj.pose._rebuild()
+  context.mode = 'EDIT' if mode == 'EDIT' else 'OBJECT'
+  return {'FINISHED'}
+
+
+def reset():
+  """
+  Empties the data and creates a new scene (as bpy.ops.wm.read_factory_settings(use_empty=True)).
+  """
+  global context
+  data.objects = Objects()
+  data.actions = Actions()
+  data.armatures = Armatures()
+  context = Context()
+
+
+data = _types.SimpleNamespace()
+context = None
+reset()
+
+ops = _types.SimpleNamespace(
+  object=_types.SimpleNamespace(mode_set=_mode_set),
+  wm=_types.SimpleNamespace(read_factory_settings=lambda use_empty=True: reset()))
+app = _types.SimpleNamespace(version=(0, 0, 0), version_string="stand-in", background=True)
@@ -0,0 +1,6 @@
+"""
+Lightweight stand-in of bpy_extras.io_utils (see bpy.py).
+"""
+
+class ImportHelper():
+  filepath = ""
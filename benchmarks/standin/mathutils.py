@@ -0,0 +1,118 @@
+"""
+Lightweight stand-in of Blender's mathutils module, with the subset used by animation_transfer.py.
+Matrices are stored as NumPy arrays. It is only meant to run the benchmarks outside of Blender.
+"""
+
+from math import cos, sin
+
+import numpy as np
+
+
+class Vector(list):
+  def __init__(self, values=(0.0, 0.0, 0.0)):
+    super().__init__(float(v) for v in values)
+
+  def copy(self):
+    return Vector(self)
+
+  def __array__(self, dtype=None, copy=None):
+    return np.array(list(self), dtype=dtype)
+
+
+class Matrix():
+  def Identity(size):
+    return Matrix(np.identity(size))
+
+  def Translation(vector):
+    m = np.identity(4)
+    m[0:3, 3] = list(vector)[0:3]
+    return Matrix(m)
+
+  def Rotation(angle, size, axis):
+    if isinstance(axis, str):
+      axis = {'X': (1, 0, 0), 'Y': (0, 1, 0), 'Z': (0, 0, 1)}[axis]
+    axis = np.asarray(axis, dtype=float)
+    axis = axis / np.linalg.norm(axis)
+    k = np.array([[0, -axis[2], axis[1]], [axis[2], 0, -axis[0]], [-axis[1], axis[0], 0]])
+    m = np.identity(size)
+    m[0:3, 0:3] = np.identity(3) + sin(angle) * k + (1 - cos(angle)) * (k @ k)
+    return Matrix(m)
+
+  def __init__(self, rows=None):
+    self._m = np.identity(4) if rows is None else np.array([list(r) for r in rows], dtype=float)
+
+  def __matmul__(self, other):
+    if isinstance(other, Matrix):
+      return Matrix(self._m @ other._m)
+    v = np.asarray(list(other), dtype=float)
+    if len(v) < self._m.shape[1]:
+      v = np.append(v, 1.0)
+    return Vector((self._m @ v)[0:3])
+
+  def __getitem__(self, i):
+    return Vector(self._m[i])
+
+  def __iter__(self):
+    return (Vector(row) for row in self._m)
+
+  def __len__(self):
+    return self._m.shape[0]
+
+  def __array__(self, dtype=None, copy=None):
+    return np.array(self._m, dtype=dtype)
+
+  def copy(self):
+    return Matrix(self._m)
+
+  def to_3x3(self):
+    return Matrix(self._m[0:3, 0:3])
+
+  def to_4x4(self):
+    m = np.identity(4)
+    m[0:self._m.shape[0], 0:self._m.shape[1]] = self._m
+    return Matrix(m)
+
+  def to_translation(self):
+    return Vector(self._m[0:3, 3])
+
+  def to_quaternion(self):
+    m = self._m[0:3, 0:3]
+    w = np.sqrt(max(0.0, 1.0 + np.trace(m))) / 2
+    x = np.copysign(np.sqrt(max(0.0, 1.0 + m[0, 0] - m[1, 1] - m[2, 2])) / 2, m[2, 1] - m[1, 2])
+    y = np.copysign(np.sqrt(max(0.0, 1.0 - m[0, 0] + m[1, 1] - m[2, 2])) / 2, m[0, 2] - m[2, 0])
+    z = np.copysign(np.sqrt(max(0.0, 1.0 - m[0, 0] - m[1, 1] + m[2, 2])) / 2, m[1, 0] - m[0, 1])
+    return Quaternion((w, x, y, z))
+
+  @property
+  def translation(self):
+    return self.to_translation()
+
+
+class Quaternion(list):
+  def __init__(self, values=(1.0, 0.0, 0.0, 0.0), angle=None):
+    if angle is not None:
+      axis = np.asarray(values, dtype=float)
+      axis = axis / np.linalg.norm(axis)
+      values = [cos(angle / 2)] + list(axis * sin(angle / 2))
+    super().__init__(float(v) for v in values)
+
+  def to_matrix(self):
+    w, x, y, z = np.asarray(self) / np.linalg.norm(self)
+    return Matrix([[1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+                   [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+                   [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)]])
+
+  def copy(self):
+    return Quaternion(self)
+
+
+class Euler(list):
+  def __init__(self, values=(0.0, 0.0, 0.0), order='XYZ'):
+    super().__init__(float(v) for v in values)
+    self.order = order
+
+  def to_matrix(self):
+    m = Matrix.Identity(3)
+    for i, axis in enumerate(self.order):
+      m = m @ Matrix.Rotation(self[i], 3, axis)
+    return m